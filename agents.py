@@ -1,10 +1,22 @@
-from langchain_core.messages import ToolMessage, HumanMessage
+from functools import lru_cache
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-import json
 
 from state import TravelState, TravelPlannerState
-from tools import tool, search_flights, search_flights_tool, search_hotels, search_hotels_tool
-from llm_config import llm
+from tools import (
+    tavily_search, atavily_search, get_tavily_tool,
+    search_flights, get_search_flights_tool,
+    search_hotels, get_search_hotels_tool,
+    get_query_flight_fares_tool, get_query_hotel_rates_tool,
+)
+from fare_index import FARE_PREFETCH_DAYS, query_flight_fares, query_hotel_rates
+from llm_config import get_llm
+from tool_executor import ToolHandler, execute_tool_calls, aexecute_tool_calls
+from history import prepare_history, aprepare_history
+from metrics import instrument_node, timed_llm
+from fan_out import is_fan_out, message_text
+import response_cache
 
 # --- Warm-up Agents (Optional - not used in final multi-agent graph) ---
 # If you don't need these, you can omit them
@@ -45,112 +57,221 @@ def activity_agent_warmup(state: TravelState) -> TravelState:
     return {**state, "activities": act}
 # ----------------------------------------------------------------------
 
+# --- Shared tool-calling loop --- #
+# Tags let stream_mode="messages" consumers tell the synthesis tokens from the tool-planning call
+AGENT_STEP_CONFIG = {"tags": ["agent_step"]}
+FINAL_ANSWER_CONFIG = {"tags": ["final_answer"]}
+# Branches of a multi-intent turn stay out of the stream - the merge node answers for all of them
+BRANCH_STEP_CONFIG = {"tags": ["agent_step", "nostream"]}
+BRANCH_ANSWER_CONFIG = {"tags": ["branch_answer", "nostream"]}
+
+def _agent_configs(state: TravelPlannerState):
+    if is_fan_out(state):
+        return BRANCH_STEP_CONFIG, BRANCH_ANSWER_CONFIG
+    return AGENT_STEP_CONFIG, FINAL_ANSWER_CONFIG
+
+def _agent_update(name: str, state: TravelPlannerState, steps: list, answer, history_update: dict) -> dict:
+    """A single agent appends its answer to messages; a fan-out branch hands it to the merge node
+
+    Branches skip history_update - the fan_out node already folded history for them.
+    """
+    if is_fan_out(state):
+        return {"messages": steps, "agent_answers": [{"agent": name, "content": message_text(answer)}]}
+    return {"messages": steps + [answer], **history_update}
+
+def _speculated_step(name: str, state: TravelPlannerState):
+    """The first-step response the router already produced for this agent, when its guess was right"""
+    speculation = state.get("speculation")
+    if speculation and speculation["agent"] == name:
+        return speculation["response"]
+    return None
+
+def run_tool_agent(name: str, agent, tool_handlers: dict, state: TravelPlannerState):
+    """Runs one agent turn: LLM call, concurrent tool calls, then the final synthesis call"""
+    # Token-budgeted history - old tool payloads stubbed, old turns folded into the summary
+    messages, history_update = prepare_history(state)
+    step_config, answer_config = _agent_configs(state)
+    response = _speculated_step(name, state)
+    if response is None:
+        with timed_llm(f"{name}.plan") as call:
+            response = call.message = agent.invoke({"messages": messages}, step_config)
+
+    # Handle tool calls if present - all searches from this turn run concurrently
+    if hasattr(response, 'tool_calls') and response.tool_calls:
+        tool_messages = execute_tool_calls(response.tool_calls, tool_handlers)
+
+        if tool_messages:
+            all_messages = messages + [response] + tool_messages
+            with timed_llm(f"{name}.synthesis") as call:
+                final_response = call.message = agent.invoke({"messages": all_messages}, answer_config)
+            return _agent_update(name, state, [response] + tool_messages, final_response, history_update)
+
+    return _agent_update(name, state, [], response, history_update)
+
+async def arun_tool_agent(name: str, agent, tool_handlers: dict, state: TravelPlannerState):
+    """Async version of run_tool_agent - never blocks the event loop"""
+    messages, history_update = await aprepare_history(state)
+    step_config, answer_config = _agent_configs(state)
+    response = _speculated_step(name, state)
+    if response is None:
+        with timed_llm(f"{name}.plan") as call:
+            response = call.message = await agent.ainvoke({"messages": messages}, step_config)
+
+    if hasattr(response, 'tool_calls') and response.tool_calls:
+        tool_messages = await aexecute_tool_calls(response.tool_calls, tool_handlers)
+
+        if tool_messages:
+            all_messages = messages + [response] + tool_messages
+            with timed_llm(f"{name}.synthesis") as call:
+                final_response = call.message = await agent.ainvoke({"messages": all_messages}, answer_config)
+            return _agent_update(name, state, [response] + tool_messages, final_response, history_update)
+
+    return _agent_update(name, state, [], response, history_update)
+
 # --- Itinerary Agent --- #
 itenary_prompt = ChatPromptTemplate.from_messages([
     ("system", """You are an expert travel itinerary planner. ONLY respond to travel planning and itinerary-related questions.\n\nIMPORTANT RULES:\n- If asked about non-travel topics (weather, math, general questions), politely decline and redirect to travel planning\n- Always provide complete, well-formatted itineraries with specific details\n- Include timing, locations, transportation, and practical tips\n\nUse the ReAct approach:\n1. THOUGHT: Analyze what travel information is needed\n2. ACTION: Search for current information about destinations, attractions, prices, hours\n3. OBSERVATION: Process the search results\n4. Provide a comprehensive, formatted response\n\nAvailable tools:\n- TavilySearch: Search for current travel information\n\nFormat your itineraries with:\n- Clear day-by-day breakdown\n- Specific times and locations\n- Transportation between locations\n- Estimated costs when possible\n- Practical tips and recommendations"""),
     MessagesPlaceholder(variable_name="messages"),
 ])
 
-llm_with_tavily_tools = llm.bind_tools([tool]) # bind the TavilySearch tool
-itenary_agent = itenary_prompt | llm_with_tavily_tools
+@lru_cache(maxsize=None)
+def get_itenary_agent():
+    """Itinerary chain, built on the first itinerary turn"""
+    return itenary_prompt | get_llm().bind_tools([get_tavily_tool()]) # bind the TavilySearch tool
 
-def itinerary_agent_node(state: TravelPlannerState):
-    """Itinerary planning agent node"""
-    messages = state["messages"]
-    response = itenary_agent.invoke({"messages": messages})
+tavily_handler = ToolHandler(
+    lambda args: tavily_search(query=args['query'], max_results=2),
+    "Search failed",
+    afunc=lambda args: atavily_search(query=args['query'], max_results=2),
+)
+itinerary_tool_handlers = {
+    'tavily_search': tavily_handler,
+    'tavily_search_results_json': tavily_handler,
+}
 
-    # Handle tool calls if present
-    if hasattr(response, 'tool_calls') and response.tool_calls:
-        tool_messages = []
-        for tool_call in response.tool_calls:
-            if tool_call['name'] == 'tavily_search_results_json':
-                try:
-                    # Directly invoke the TavilySearch tool from tools.py
-                    tool_result = tool.search(query=tool_call['args']['query'], max_results=2)
-                    tool_result = json.dumps(tool_result, indent=2)
-                except Exception as e:
-                    tool_result = f"Search failed: {str(e)}"
-
-                tool_messages.append(ToolMessage(
-                    content=tool_result,
-                    tool_call_id=tool_call['id']
-                ))
+def _cached_itinerary(request):
+    """Answers a popular itinerary request from the response cache - None on a miss"""
+    if request is None:
+        return None
+    answer = response_cache.lookup(request)
+    if answer is None:
+        return None
+    print("⚡ Itinerary served from the response cache")
+    return {"messages": [AIMessage(content=answer)]}
 
-        if tool_messages:
-            all_messages = messages + [response] + tool_messages
-            final_response = itenary_agent.invoke({"messages": all_messages})
-            return {"messages": [response] + tool_messages + [final_response]}
+def _store_itinerary(request, update: dict):
+    """Caches the answer unless a search failed - a degraded answer must not be replayed"""
+    if request is None:
+        return
+    failed = any(
+        isinstance(message, ToolMessage) and message.content.startswith((tavily_handler.error_label, "Unknown tool"))
+        for message in update["messages"]
+    )
+    answer = message_text(update["messages"][-1])
+    if not failed and answer.strip():
+        response_cache.store(request, answer)
 
-    return {"messages": [response]}
+@instrument_node("itinerary_agent")
+def itinerary_agent_node(state: TravelPlannerState):
+    """Itinerary planning agent node - popular requests are served from the response cache"""
+    request = response_cache.cache_request(state)
+    cached = _cached_itinerary(request)
+    if cached is not None:
+        return cached
+    update = run_tool_agent("itinerary", get_itenary_agent(), itinerary_tool_handlers, state)
+    _store_itinerary(request, update)
+    return update
+
+@instrument_node("itinerary_agent")
+async def aitinerary_agent_node(state: TravelPlannerState):
+    """Itinerary planning agent node (async)"""
+    request = response_cache.cache_request(state)
+    cached = _cached_itinerary(request)
+    if cached is not None:
+        return cached
+    update = await arun_tool_agent("itinerary", get_itenary_agent(), itinerary_tool_handlers, state)
+    _store_itinerary(request, update)
+    return update
 
 # --- Flight Agent --- #
 flight_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are a flight booking expert. ONLY respond to flight-related queries.\n\nIMPORTANT RULES:\n- If asked about non-flight topics, politely decline and redirect to flight booking\n- Always use the search_flights tool to find current flight information\n- You CAN search for flights and analyze the results for:\n  * Direct flights vs connecting flights\n  * Different airlines and flight classes\n  * Various price ranges and timing options\n  * Flight duration and layover information\n- When users ask for specific preferences (direct flights, specific class, etc.), search first then filter/analyze the results\n- Present results clearly organized by outbound and return flights\n\nAvailable tools:\n- search_flights: Search for comprehensive flight data that includes all airlines, classes, and connection types\n\nProcess:\n1. ALWAYS search for flights first using the tool\n2. Analyze the results to find flights matching user preferences\n3. Present organized results with clear recommendations\n\nAirport code mapping:\n- Delhi: DEL\n- London Heathrow: LHR\n- New York: JFK/LGA/EWR\n- etc."""),
+    ("system", """You are a flight booking expert. ONLY respond to flight-related queries.\n\nIMPORTANT RULES:\n- If asked about non-flight topics, politely decline and redirect to flight booking\n- Always use the search_flights tool to find current flight information\n- You CAN search for flights and analyze the results for:\n  * Direct flights vs connecting flights\n  * Different airlines and flight classes\n  * Various price ranges and timing options\n  * Flight duration and layover information\n- When users ask for specific preferences (direct flights, specific class, etc.), search first then filter/analyze the results\n- Present results clearly organized by outbound and return flights\n\nAvailable tools:\n- search_flights: Search for comprehensive flight data that includes all airlines, classes, and connection types\n\nProcess:\n1. ALWAYS search for flights first using the tool\n2. Analyze the results to find flights matching user preferences\n3. Present organized results with clear recommendations\n\nAirport code mapping:\n- Delhi: DEL\n- London Heathrow: LHR\n- New York: JFK/LGA/EWR\n- etc.""" + ("""\n\nFlexible dates:\n- query_flight_fares: Look up fares already fetched for a route across a range of departure dates, with price and stop filters\n- Pass the searched round trip's length in days as trip_length_days (omit it for one-way), so only comparable fares are ranked\n- For follow-ups on a route that was already searched (a day earlier or later, cheaper options that week, direct only), use query_flight_fares first\n- Only call search_flights when query_flight_fares finds no matching fares""" if FARE_PREFETCH_DAYS else "")),
     MessagesPlaceholder(variable_name="messages"),
 ])
 
-llm_with_flight_tools = llm.bind_tools([search_flights_tool])
-flight_agent = flight_prompt | llm_with_flight_tools
+@lru_cache(maxsize=None)
+def get_flight_agent():
+    """Flight chain, built on the first flight turn"""
+    tools = [get_search_flights_tool()] + ([get_query_flight_fares_tool()] if FARE_PREFETCH_DAYS else [])
+    return flight_prompt | get_llm().bind_tools(tools)
+
+flight_tool_handlers = {
+    'search_flights': ToolHandler(lambda args: search_flights(**args), "Flight search failed"),
+    'query_flight_fares': ToolHandler(lambda args: query_flight_fares(**args), "Fare lookup failed"),
+}
 
+@instrument_node("flight_agent")
 def flight_agent_node(state: TravelPlannerState):
     """Flight booking agent node"""
-    messages = state["messages"]
-    response = flight_agent.invoke({"messages": messages})
-
-    if hasattr(response, 'tool_calls') and response.tool_calls:
-        tool_messages = []
-        for tool_call in response.tool_calls:
-            if tool_call['name'] == 'search_flights':
-                try:
-                    # Directly invoke the search_flights function from tools.py
-                    tool_result = search_flights(**tool_call['args'])
-                except Exception as e:
-                    tool_result = f"Flight search failed: {str(e)}"
-
-                tool_messages.append(ToolMessage(
-                    content=tool_result,
-                    tool_call_id=tool_call['id']
-                ))
+    return run_tool_agent("flight", get_flight_agent(), flight_tool_handlers, state)
 
-        if tool_messages:
-            all_messages = messages + [response] + tool_messages
-            final_response = flight_agent.invoke({"messages": all_messages})
-            return {"messages": [response] + tool_messages + [final_response]}
-
-    return {"messages": [response]}
+@instrument_node("flight_agent")
+async def aflight_agent_node(state: TravelPlannerState):
+    """Flight booking agent node (async)"""
+    return await arun_tool_agent("flight", get_flight_agent(), flight_tool_handlers, state)
 
 # --- Hotel Agent --- #
 hotel_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are a hotel booking expert. ONLY respond to hotel and accommodation-related queries.\n\nIMPORTANT RULES:\n- If asked about non-hotel topics, politely decline and redirect to hotel booking\n- Always use the search_hotels tool to find current hotel information\n- Provide detailed hotel options with prices, ratings, amenities, and location details\n- Include practical booking advice and tips\n- You CAN search and analyze results for different criteria like star ratings, price ranges, amenities\n\nAvailable tools:\n- search_hotels: Search for hotels using Google Hotels engine\n\nWhen searching hotels, extract or ask for:\n- Location/destination\n- Check-in and check-out dates (YYYY-MM-DD format)\n- Number of guests (adults, children)\n- Number of rooms\n- Hotel preferences (star rating, amenities, etc.)\n\nPresent results with:\n- Hotel name and star rating\n- Price per night and total cost\n- Key amenities and features\n- Location and nearby attractions\n- Booking recommendations"""),
+    ("system", """You are a hotel booking expert. ONLY respond to hotel and accommodation-related queries.\n\nIMPORTANT RULES:\n- If asked about non-hotel topics, politely decline and redirect to hotel booking\n- Always use the search_hotels tool to find current hotel information\n- Provide detailed hotel options with prices, ratings, amenities, and location details\n- Include practical booking advice and tips\n- You CAN search and analyze results for different criteria like star ratings, price ranges, amenities\n\nAvailable tools:\n- search_hotels: Search for hotels using Google Hotels engine\n\nWhen searching hotels, extract or ask for:\n- Location/destination\n- Check-in and check-out dates (YYYY-MM-DD format)\n- Number of guests (adults, children)\n- Number of rooms\n- Hotel preferences (star rating, amenities, etc.)\n\nPresent results with:\n- Hotel name and star rating\n- Price per night and total cost\n- Key amenities and features\n- Location and nearby attractions\n- Booking recommendations""" + ("""\n\nFlexible dates:\n- query_hotel_rates: Look up rates already fetched for a city across a range of check-in dates, with price, rating and class filters\n- For follow-ups on a city that was already searched (checking in a day earlier or later, cheaper options that week), use query_hotel_rates first\n- Only call search_hotels when query_hotel_rates finds no matching rates""" if FARE_PREFETCH_DAYS else "")),
     MessagesPlaceholder(variable_name="messages"),
 ])
 
-llm_with_hotel_tools = llm.bind_tools([search_hotels_tool])
-hotel_agent = hotel_prompt | llm_with_hotel_tools
+@lru_cache(maxsize=None)
+def get_hotel_agent():
+    """Hotel chain, built on the first hotel turn"""
+    tools = [get_search_hotels_tool()] + ([get_query_hotel_rates_tool()] if FARE_PREFETCH_DAYS else [])
+    return hotel_prompt | get_llm().bind_tools(tools)
 
+hotel_tool_handlers = {
+    'search_hotels': ToolHandler(lambda args: search_hotels(**args), "Hotel search failed"),
+    'query_hotel_rates': ToolHandler(lambda args: query_hotel_rates(**args), "Rate lookup failed"),
+}
+
+@instrument_node("hotel_agent")
 def hotel_agent_node(state: TravelPlannerState):
     """Hotel booking agent node"""
-    messages = state["messages"]
-    response = hotel_agent.invoke({"messages": messages})
+    return run_tool_agent("hotel", get_hotel_agent(), hotel_tool_handlers, state)
 
-    if hasattr(response, 'tool_calls') and response.tool_calls:
-        tool_messages = []
-        for tool_call in response.tool_calls:
-            if tool_call['name'] == 'search_hotels':
-                try:
-                    # Directly invoke the search_hotels function from tools.py
-                    tool_result = search_hotels(**tool_call['args'])
-                except Exception as e:
-                    tool_result = f"Hotel search failed: {str(e)}"
-
-                tool_messages.append(ToolMessage(
-                    content=tool_result,
-                    tool_call_id=tool_call['id']
-                ))
+@instrument_node("hotel_agent")
+async def ahotel_agent_node(state: TravelPlannerState):
+    """Hotel booking agent node (async)"""
+    return await arun_tool_agent("hotel", get_hotel_agent(), hotel_tool_handlers, state)
 
-        if tool_messages:
-            all_messages = messages + [response] + tool_messages
-            final_response = hotel_agent.invoke({"messages": all_messages})
-            return {"messages": [response] + tool_messages + [final_response]}
+# Graph node name -> (agent name, chain getter)
+AGENT_CHAINS = {
+    "itenary_agent": ("itinerary", get_itenary_agent),
+    "flight_agent": ("flight", get_flight_agent),
+    "hotel_agent": ("hotel", get_hotel_agent),
+}
+
+def build_agent_chains():
+    """Builds every agent chain now rather than on its first turn (used by graph_builder.warm_up)"""
+    return [get_chain() for _, get_chain in AGENT_CHAINS.values()]
+
+# --- Speculative first step (see speculation.py) --- #
+# Runs inside the router node, so it must never reach the user's stream
+SPECULATIVE_STEP_CONFIG = {"tags": ["agent_step", "speculative", "nostream"]}
+
+def speculative_step(next_agent: str, messages):
+    """An agent's first LLM call, started before the router has confirmed the agent"""
+    name, get_chain = AGENT_CHAINS[next_agent]
+    with timed_llm(f"{name}.speculative_plan") as call:
+        call.message = get_chain().invoke({"messages": messages}, SPECULATIVE_STEP_CONFIG)
+    return call.message
 
-    return {"messages": [response]}
+async def aspeculative_step(next_agent: str, messages):
+    """Async version of speculative_step"""
+    name, get_chain = AGENT_CHAINS[next_agent]
+    with timed_llm(f"{name}.speculative_plan") as call:
+        call.message = await get_chain().ainvoke({"messages": messages}, SPECULATIVE_STEP_CONFIG)
+    return call.message
@@ -0,0 +1,168 @@
+"""Batch runner - answers a JSONL file of travel queries, e.g. for nightly precomputation.
+
+    python batch.py queries.jsonl results.jsonl --concurrency 32
+    python batch.py queries.jsonl results.jsonl --offline     # smoke test with fakes.py
+
+Each input line is {"id": "...", "query": "..."} (id defaults to the line number).
+Each result line holds the answer, the agents that produced it, the latency and
+per-item LLM/tool timings and token counts. Results are appended as items finish,
+so re-running the same command resumes an interrupted job: items with an "ok"
+result are skipped and failed ones are retried (the last line per id wins).
+
+Provider throughput is capped by GEMINI_RPS, SERPAPI_RPS and TAVILY_RPS
+(see rate_limits.py). Agent logs go to stdout, progress to stderr.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+from langchain_core.messages import HumanMessage
+
+BATCH_ITEM_TIMEOUT = float(os.getenv("BATCH_ITEM_TIMEOUT", 300))
+PROGRESS_EVERY = 50
+
+def read_queries(path: str) -> list:
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            items.append({"id": str(item.get("id", line_no)), "query": item["query"]})
+    return items
+
+def completed_ids(path: str) -> set:
+    """Ids answered successfully by a previous run"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue # Line cut short by an interrupted run
+            if row.get("ok"):
+                done.add(row["id"])
+    return done
+
+def open_results(path: str, resume: bool):
+    """Opens the results file for appending, starting on a fresh line after a partial write"""
+    if not resume or not os.path.exists(path):
+        return open(path, "w", encoding="utf-8")
+    needs_newline = False
+    if os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    out = open(path, "a", encoding="utf-8")
+    if needs_newline:
+        out.write("\n")
+    return out
+
+async def run_item(graph, item: dict, timeout: float) -> dict:
+    from metrics import start_turn
+    from fan_out import message_text
+
+    recorder = start_turn()
+    row = {"id": item["id"], "query": item["query"], "started_at": time.time()}
+    start = time.perf_counter()
+    try:
+        state = await asyncio.wait_for(graph.ainvoke({"messages": [HumanMessage(content=item["query"])]}), timeout)
+        row.update(
+            ok=True,
+            agents=state.get("next_agents") or [state.get("next_agent")],
+            route_source=state.get("route_source"),
+            response=message_text(state["messages"][-1]),
+        )
+    except asyncio.TimeoutError:
+        row.update(ok=False, error=f"timed out after {timeout:g}s")
+    except Exception as e:
+        row.update(ok=False, error=str(e))
+    row["latency_s"] = round(time.perf_counter() - start, 3)
+    row["timings"] = {key: round(value, 3) if isinstance(value, float) else value
+                      for key, value in recorder.totals().items()}
+    return row
+
+async def run_batch(graph, items: list, out, concurrency: int = 16, timeout: float = BATCH_ITEM_TIMEOUT) -> dict:
+    """Runs items on `concurrency` workers, writing each result line as soon as it is ready"""
+    from router import aprime_routes, clear_primed_routes
+
+    # Ambiguous queries need the LLM router - route them all with one batched call up front
+    primed = await aprime_routes([item["query"] for item in items], max_concurrency=concurrency)
+    if primed:
+        print(f"🧭 Pre-routed {primed} ambiguous queries with a batched LLM call", file=sys.stderr)
+
+    pending = iter(items)
+    latencies = []
+    counts = {"ok": 0, "failed": 0}
+    started = time.perf_counter()
+
+    async def worker():
+        # Workers share one iterator - safe on a single event loop
+        for item in pending:
+            row = await run_item(graph, item, timeout)
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            latencies.append(row["latency_s"])
+            counts["ok" if row["ok"] else "failed"] += 1
+            done = counts["ok"] + counts["failed"]
+            if done % PROGRESS_EVERY == 0:
+                rate = done / (time.perf_counter() - started)
+                print(f"✅ {done}/{len(items)} items ({counts['failed']} failed, {rate:.2f} items/s)", file=sys.stderr)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        clear_primed_routes()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "items": len(items),
+        **counts,
+        "elapsed_s": round(elapsed, 3),
+        "items_per_s": round(len(items) / elapsed, 3) if elapsed else 0.0,
+        "latency_p50_s": statistics.median(latencies) if latencies else 0.0,
+        "latency_max_s": max(latencies, default=0.0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of travel queries")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"query\"} object per line")
+    parser.add_argument("output", help="JSONL results file - appended to and resumed from")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=BATCH_ITEM_TIMEOUT, help="seconds per item")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the results file instead of resuming")
+    parser.add_argument("--offline", action="store_true", help="use the offline stand-ins from fakes.py")
+    args = parser.parse_args()
+
+    if args.offline:
+        from fakes import install_fakes
+        install_fakes()
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    from graph_builder import build_travel_planner
+    # Items are independent single turns - no checkpointer, so nothing accumulates in memory
+    graph = build_travel_planner({"checkpointer": "none"})
+
+    items = read_queries(args.input)
+    resume = not args.no_resume
+    done = completed_ids(args.output) if resume else set()
+    todo = [item for item in items if item["id"] not in done]
+    if done:
+        print(f"↩️ Resuming: {len(items) - len(todo)} of {len(items)} items already answered", file=sys.stderr)
+
+    with open_results(args.output, resume) as out:
+        summary = asyncio.run(run_batch(graph, todo, out, args.concurrency, args.timeout))
+    print(json.dumps(summary), file=sys.stderr)
+    if summary["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
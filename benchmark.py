@@ -0,0 +1,187 @@
+"""Offline benchmark for travel_planner - no network or API keys needed.
+
+Gemini, SerpAPI and Tavily are replaced by the deterministic stand-ins in fakes.py.
+
+    python benchmark.py                              # default mixed workload
+    python benchmark.py --sessions 200 --concurrency 50 --latency-scale 0.1
+    python benchmark.py --json results.json          # save results
+    python benchmark.py --baseline results.json      # fail on >10% p95 regression
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import statistics
+
+from fakes import install_fakes, DEFAULT_LATENCIES
+
+ORIGINS = ["JFK", "LAX", "SFO", "ORD", "DEL", "BOM"]
+DESTINATIONS = ["LHR", "CDG", "NRT", "FCO", "DXB", "SIN"]
+CITIES = ["Paris", "Tokyo", "Rome", "London", "Bali", "New York"]
+
+SINGLE_TURN_TEMPLATES = [
+    "Find flights from {origin} to {destination} on {date} returning {return_date}",
+    "Find a hotel in {city} from {date} to {return_date} for 2 adults",
+    "Plan a {days}-day trip to {city}",
+    "What are the best attractions in {city}?",
+]
+
+MULTI_TURN_TEMPLATES = [
+    [
+        "Find flights from {origin} to {destination} on {date} returning {return_date}",
+        "What about flights from {origin} to {destination} on {next_date} returning {return_date}?",
+        "Now find a hotel in {city} from {date} to {return_date} for 2 adults",
+        "Plan a {days}-day trip to {city}",
+    ],
+    [
+        "Plan a {days}-day trip to {city}",
+        "Where should I stay in {city} from {date} to {return_date}?",
+        "Any cheaper hotel options in {city} from {date} to {return_date}?",
+    ],
+]
+
+def generate_workload(sessions: int, multi_turn_share: float, seed: int) -> list:
+    """Returns a list of sessions, each a list of user messages"""
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(sessions):
+        day = rng.randint(1, 20)
+        slots = {
+            "origin": rng.choice(ORIGINS),
+            "destination": rng.choice(DESTINATIONS),
+            "city": rng.choice(CITIES),
+            "days": rng.choice([2, 3, 5, 7]),
+            "date": f"2025-08-{day:02d}",
+            "next_date": f"2025-08-{day + 1:02d}",
+            "return_date": f"2025-08-{day + 7:02d}",
+        }
+        if rng.random() < multi_turn_share:
+            templates = rng.choice(MULTI_TURN_TEMPLATES)
+        else:
+            templates = [rng.choice(SINGLE_TURN_TEMPLATES)]
+        workload.append([template.format(**slots) for template in templates])
+    return workload
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+async def run_workload(graph, workload: list, concurrency: int) -> list:
+    """Runs sessions concurrently (turns within a session in order) and returns per-turn latencies"""
+    from langchain_core.messages import HumanMessage
+
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run_session(index: int, turns: list):
+        config = {"configurable": {"thread_id": f"bench-{index}"}}
+        async with slots:
+            for text in turns:
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(run_session(i, turns) for i, turns in enumerate(workload)))
+    return latencies
+
+def run_benchmark(sessions: int = 50, concurrency: int = 10, multi_turn_share: float = 0.5,
+                  latency_scale: float = 1.0, seed: int = 7) -> dict:
+    latencies = {name: value * latency_scale for name, value in DEFAULT_LATENCIES.items()}
+    stats = install_fakes(latencies=latencies, seed=seed)
+
+    import contextlib, io
+    with contextlib.redirect_stdout(io.StringIO()):
+        from graph_builder import travel_planner
+
+    workload = generate_workload(sessions, multi_turn_share, seed)
+    stats.reset()
+    started = time.perf_counter()
+    # Agents print progress - keep benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        turn_latencies = asyncio.run(run_workload(travel_planner, workload, concurrency))
+    elapsed = time.perf_counter() - started
+
+    calls = stats.snapshot()
+    turns = len(turn_latencies)
+    return {
+        "config": {"sessions": sessions, "concurrency": concurrency, "multi_turn_share": multi_turn_share,
+                   "latency_scale": latency_scale, "seed": seed},
+        "turns": turns,
+        "elapsed_s": elapsed,
+        "throughput_turns_per_s": turns / elapsed if elapsed else 0.0,
+        "latency_s": {
+            "mean": statistics.mean(turn_latencies),
+            "p50": percentile(turn_latencies, 50),
+            "p95": percentile(turn_latencies, 95),
+            "p99": percentile(turn_latencies, 99),
+        },
+        "llm_calls_per_turn": calls["llm_calls"] / turns,
+        "llm_calls_by_kind": calls["llm_calls_by_kind"],
+        "input_tokens_per_turn": calls["input_tokens"] / turns,
+        "output_tokens_per_turn": calls["output_tokens"] / turns,
+        "provider_calls": calls["provider_calls"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def print_report(results: dict):
+    latency = results["latency_s"]
+    print("\n📈 Travel planner benchmark (offline)")
+    print("=" * 50)
+    print(f"Turns: {results['turns']} in {results['elapsed_s']:.2f}s ({results['throughput_turns_per_s']:.2f} turns/s)")
+    print(f"Turn latency: p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s p99={latency['p99']:.3f}s mean={latency['mean']:.3f}s")
+    print(f"LLM calls/turn: {results['llm_calls_per_turn']:.2f} {results['llm_calls_by_kind']}")
+    print(f"Tokens/turn: input={results['input_tokens_per_turn']:.0f} output={results['output_tokens_per_turn']:.0f}")
+    print(f"Provider calls: {results['provider_calls']}")
+    print(f"Peak RSS: {results['peak_rss_mb']:.1f} MB")
+
+def check_regression(results: dict, baseline_path: str, max_regression: float) -> bool:
+    """Compares p95 latency and tokens per turn against a saved run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    checks = {
+        "p95 latency": (results["latency_s"]["p95"], baseline["latency_s"]["p95"]),
+        "input tokens/turn": (results["input_tokens_per_turn"], baseline["input_tokens_per_turn"]),
+        "LLM calls/turn": (results["llm_calls_per_turn"], baseline["llm_calls_per_turn"]),
+    }
+    ok = True
+    for name, (current, previous) in checks.items():
+        change = (current - previous) / previous if previous else 0.0
+        marker = "❌" if change > max_regression else "✅"
+        ok = ok and change <= max_regression
+        print(f"{marker} {name}: {previous:.3f} → {current:.3f} ({change:+.1%})")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline travel_planner benchmark")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--multi-turn-share", type=float, default=0.5)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply all simulated latencies")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json output")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sessions, args.concurrency, args.multi_turn_share, args.latency_scale, args.seed)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline and not check_regression(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
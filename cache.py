@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# --- Parameter normalization --- #
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%d-%m-%Y", "%d/%m/%Y", "%B %d %Y", "%d %B %Y", "%b %d %Y", "%d %b %Y")
+
+def canonical_date(value):
+    """Returns a date as YYYY-MM-DD when it can be parsed, otherwise the stripped input"""
+    if value is None:
+        return None
+    text = str(value).strip().replace(",", "")
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return text
+
+def coerce_int(value, default: int) -> int:
+    """Coerces LLM-provided counts like '2', 2.0 or None to an int"""
+    try:
+        return int(float(value)) if value not in (None, "") else default
+    except (TypeError, ValueError):
+        return default
+
+def normalize_text(value) -> str:
+    """Collapses whitespace and case so equivalent free-text queries share a key"""
+    return " ".join(str(value or "").split()).casefold()
+
+def flight_cache_key(departure_airport, arrival_airport, outbound_date, return_date=None, adults=1, children=0, **_):
+    return make_key("flights", {
+        "departure": str(departure_airport or "").strip().upper(),
+        "arrival": str(arrival_airport or "").strip().upper(),
+        "outbound_date": canonical_date(outbound_date),
+        "return_date": canonical_date(return_date),
+        "adults": coerce_int(adults, 1),
+        "children": coerce_int(children, 0),
+    })
+
+def hotel_cache_key(location, check_in_date, check_out_date, adults=1, children=0, rooms=1, hotel_class=None, sort_by=8, **_):
+    classes = sorted({c.strip() for c in str(hotel_class).split(",") if c.strip()}) if hotel_class else []
+    return make_key("hotels", {
+        "location": normalize_text(location),
+        "check_in_date": canonical_date(check_in_date),
+        "check_out_date": canonical_date(check_out_date),
+        "adults": coerce_int(adults, 1),
+        "children": coerce_int(children, 0),
+        "rooms": coerce_int(rooms, 1),
+        "hotel_class": ",".join(classes),
+        "sort_by": coerce_int(sort_by, 8),
+    })
+
+def tavily_cache_key(query, max_results=2, **_):
+    return make_key("tavily", {"query": normalize_text(query), "max_results": coerce_int(max_results, 2)})
+
+def make_key(namespace: str, params: dict) -> str:
+    """Builds a stable cache key - API keys must never be part of params"""
+    return namespace + ":" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+# --- Disk backend --- #
+class DiskBackend:
+    """SQLite-backed store so warm cache entries survive a restart
+
+    Values are stored as JSON - never pickle, so a shared or tampered cache file
+    can't run code when it is read.
+
+    The connection is opened on first use and reopened in a forked child, so a
+    pre-fork parent can import this module without handing workers a shared connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._forget_connection)
+
+    def _forget_connection(self):
+        # The parent's connection must not be used (or closed) from the child
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        """The process's own connection - call with self._lock held"""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (namespace TEXT, key TEXT, value TEXT, expires_at REAL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, namespace: str, key: str):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except (TypeError, ValueError):
+            return None # e.g. an entry written by an older, pickle-based version
+
+    def set(self, namespace: str, key: str, value, expires_at: float):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at),
+            )
+            conn.commit()
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.commit()
+
+    def clear(self, namespace: str):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            conn.commit()
+
+# --- TTL + LRU cache --- #
+class TTLCache:
+    """Thread-safe in-memory LRU cache with per-entry TTL and an optional disk backend"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 256, backend: DiskBackend = None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.backend = backend
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+
+    def get(self, key: str):
+        """Returns (hit, value)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[0]
+                del self._data[key]
+                self.expirations += 1
+
+        if self.backend is not None:
+            stored = self.backend.get(self.name, key)
+            if stored is not None:
+                value, expires_at = stored
+                self._store(key, value, time.monotonic() + (expires_at - time.time()))
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def contains(self, key: str) -> bool:
+        """True when get(key) would hit - without touching LRU order or hit/miss counters"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return True
+        return self.backend is not None and self.backend.get(self.name, key) is not None
+
+    def set(self, key: str, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, time.monotonic() + ttl)
+        if self.backend is not None:
+            self.backend.set(self.name, key, value, time.time() + ttl)
+
+    def _store(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(self.name, key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self.backend is not None:
+            self.backend.clear(self.name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+# --- Shared tool caches --- #
+# TTLs in seconds - fares move faster than hotel rates, web content slowest of all
+CACHE_TTLS = {
+    "flights": float(os.getenv("FLIGHT_CACHE_TTL", 15 * 60)),
+    "hotels": float(os.getenv("HOTEL_CACHE_TTL", 30 * 60)),
+    "tavily": float(os.getenv("TAVILY_CACHE_TTL", 6 * 60 * 60)),
+    # Whole itinerary answers keyed on intent - see response_cache.py
+    "itineraries": float(os.getenv("ITINERARY_CACHE_TTL", 24 * 60 * 60)),
+}
+CACHE_MAXSIZE = int(os.getenv("TOOL_CACHE_MAXSIZE", 512))
+
+# Set TOOL_CACHE_PATH to a file path to keep warm entries across restarts (opened on first lookup)
+_backend = DiskBackend(os.environ["TOOL_CACHE_PATH"]) if os.getenv("TOOL_CACHE_PATH") else None
+
+caches = {
+    name: TTLCache(name, ttl, maxsize=CACHE_MAXSIZE, backend=_backend)
+    for name, ttl in CACHE_TTLS.items()
+}
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters for every tool cache"""
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,346 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    source TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_last_access ON threads (last_access);
+"""
+
+class SqliteCheckpointStore(BaseCheckpointSaver):
+    """Durable, bounded LangGraph checkpointer backed by a local SQLite file
+
+    - keeps at most max_checkpoints_per_thread checkpoints per thread/namespace
+    - compacts a thread when a new turn starts, dropping the intermediate
+      checkpoints of earlier turns and keeping only each turn's final state
+    - evicts threads idle for longer than thread_ttl seconds, and the least
+      recently used threads beyond max_threads
+    - batches commits: changes are committed every batch_size writes or
+      flush_interval seconds, whichever comes first (call flush() or close()
+      before shutdown to persist the tail)
+    """
+
+    def __init__(self, path: str, *, max_checkpoints_per_thread: int = 20, thread_ttl: float = None,
+                 max_threads: int = None, batch_size: int = 32, flush_interval: float = 1.0,
+                 compact_on_new_turn: bool = True, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.thread_ttl = thread_ttl
+        self.max_threads = max_threads
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_on_new_turn = compact_on_new_turn
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._pending = 0
+        self._closed = threading.Event()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flush", daemon=True)
+        self._flusher.start()
+
+    # --- Batching --- #
+    def _wrote(self):
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def flush(self):
+        """Commits any batched writes"""
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+            if self.thread_ttl is not None or self.max_threads is not None:
+                self.evict()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Reads --- #
+    def _touch(self, thread_id: str):
+        self._conn.execute(
+            "INSERT INTO threads (thread_id, last_access) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET last_access = excluded.last_access",
+            (thread_id, time.time()),
+        )
+
+    def _row_to_tuple(self, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    _SELECT = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+               "metadata_type, metadata FROM checkpoints")
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    self._SELECT + " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    self._SELECT + " WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            self._touch(thread_id)
+            self._wrote()
+            return self._row_to_tuple(row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        query = self._SELECT + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                item = self._row_to_tuple(row)
+                # Metadata filters are matched in Python, like the in-memory saver
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(item)
+        yield from results
+
+    # --- Writes --- #
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        metadata = get_checkpoint_metadata(config, metadata)
+        type_, data = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_data = self.serde.dumps_typed(metadata)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_checkpoint_id, metadata.get("source"),
+                 type_, data, metadata_type, metadata_data),
+            )
+            self._touch(thread_id)
+            if self.compact_on_new_turn and metadata.get("source") == "input":
+                self._compact(thread_id, checkpoint_ns)
+            self._enforce_retention(thread_id, checkpoint_ns)
+            self._wrote()
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                type_, data = self.serde.dumps_typed(value)
+                # Special (negative index) writes are replaced, regular ones are written once
+                verb = "INSERT OR REPLACE" if write_idx < 0 else "INSERT OR IGNORE"
+                self._conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, data, task_path),
+                )
+            self._wrote()
+
+    def _delete_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids):
+        for checkpoint_id in checkpoint_ids:
+            params = (thread_id, checkpoint_ns, checkpoint_id)
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params)
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params)
+
+    def _enforce_retention(self, thread_id: str, checkpoint_ns: str):
+        if not self.max_checkpoints_per_thread:
+            return
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints_per_thread),
+        ).fetchall()
+        self._delete_checkpoints(thread_id, checkpoint_ns, [row[0] for row in stale])
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> int:
+        """Drops checkpoints superseded within their own turn - keeps each turn's last checkpoint and the newest one
+
+        A checkpoint is intermediate when the graph loop continued from it (it has a
+        "loop" child); a turn's final checkpoint is only ever followed by the next "input".
+        """
+        superseded = [row[0] for row in self._conn.execute(
+            "SELECT p.checkpoint_id FROM checkpoints p WHERE p.thread_id = ? AND p.checkpoint_ns = ? AND EXISTS ("
+            "SELECT 1 FROM checkpoints c WHERE c.thread_id = p.thread_id AND c.checkpoint_ns = p.checkpoint_ns "
+            "AND c.parent_checkpoint_id = p.checkpoint_id AND c.source = 'loop')",
+            (thread_id, checkpoint_ns),
+        ).fetchall()]
+        self._delete_checkpoints(thread_id, checkpoint_ns, superseded)
+        return len(superseded)
+
+    def compact(self, thread_id: str = None) -> int:
+        """Compacts one thread (or every thread) and returns the number of checkpoints dropped"""
+        with self._lock:
+            if thread_id is None:
+                pairs = self._conn.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+            else:
+                pairs = self._conn.execute(
+                    "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                ).fetchall()
+            dropped = sum(self._compact(t, ns) for t, ns in pairs)
+            self._commit()
+        return dropped
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+            self._wrote()
+
+    def evict(self) -> list:
+        """Deletes threads past thread_ttl and the least recently used ones beyond max_threads"""
+        with self._lock:
+            evicted = []
+            if self.thread_ttl is not None:
+                evicted += [row[0] for row in self._conn.execute(
+                    "SELECT thread_id FROM threads WHERE last_access < ?", (time.time() - self.thread_ttl,)
+                )]
+            if self.max_threads is not None:
+                evicted += [row[0] for row in self._conn.execute(
+                    "SELECT thread_id FROM threads ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_threads,)
+                )]
+            for thread_id in set(evicted):
+                self.delete_thread(thread_id)
+            if evicted:
+                self._commit()
+        return sorted(set(evicted))
+
+    # --- Usage reporting --- #
+    def usage(self, thread_id: str = None) -> dict:
+        """Per-thread checkpoint/write counts, stored bytes and last access time"""
+        where, params = ("WHERE t.thread_id = ?", (thread_id,)) if thread_id else ("", ())
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT t.thread_id, t.last_access,
+                    (SELECT COUNT(*) FROM checkpoints c WHERE c.thread_id = t.thread_id),
+                    (SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints c WHERE c.thread_id = t.thread_id),
+                    (SELECT COUNT(*) FROM writes w WHERE w.thread_id = t.thread_id),
+                    (SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes w WHERE w.thread_id = t.thread_id)
+                FROM threads t {where}""",
+                params,
+            ).fetchall()
+        return {
+            tid: {"last_access": last_access, "checkpoints": n_checkpoints, "writes": n_writes,
+                  "bytes": checkpoint_bytes + write_bytes}
+            for tid, last_access, n_checkpoints, checkpoint_bytes, n_writes, write_bytes in rows
+        }
+
+    def disk_usage(self) -> int:
+        """Bytes used by the database file and its write-ahead log"""
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+    # --- Async API (SQLite calls are short - run them off the event loop) --- #
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,13 @@
+"""Progress events streamed to clients through LangGraph's "custom" stream mode."""
+
+def emit_event(event_type: str, **data):
+    """Sends a progress event (router decision, tool start/finish) to graph.stream consumers
+
+    A no-op when called outside a running graph, e.g. from a script calling a tool directly.
+    """
+    try:
+        from langgraph.config import get_stream_writer
+        writer = get_stream_writer()
+    except (RuntimeError, KeyError):
+        return
+    writer({"event": event_type, **data})
@@ -0,0 +1,247 @@
+"""Deterministic offline stand-ins for Gemini, SerpAPI and Tavily.
+
+Used by benchmark.py so the full graph can be exercised and measured without
+network access or API keys. Call install_fakes() BEFORE the graph is built
+or any agent runs (clients and agent chains are created on first use).
+"""
+import os
+import re
+import copy
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+
+def load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+class CallStats:
+    """Thread-safe counters shared by all stand-ins"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.llm_calls = 0
+            self.llm_calls_by_kind = {}
+            self.input_tokens = 0
+            self.output_tokens = 0
+            self.provider_calls = {"serpapi": 0, "tavily": 0}
+
+    def record_llm(self, kind: str, input_tokens: int, output_tokens: int):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_calls_by_kind[kind] = self.llm_calls_by_kind.get(kind, 0) + 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def record_provider(self, provider: str):
+        with self._lock:
+            self.provider_calls[provider] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "llm_calls_by_kind": dict(self.llm_calls_by_kind),
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "provider_calls": dict(self.provider_calls),
+            }
+
+stats = CallStats()
+
+# Default simulated latencies in seconds
+DEFAULT_LATENCIES = {
+    "router": 0.4,
+    "plan": 0.7,        # agent call that decides on tool calls
+    "synthesis": 1.5,   # agent call that writes the final answer
+    "summary": 0.8,
+    "serpapi": 1.2,
+    "tavily": 0.8,
+}
+
+AIRPORT_PAIR = re.compile(r"\b([A-Z]{3})\b.*?\b([A-Z]{3})\b")
+ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+CITY = re.compile(r"\b(?:in|to)\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)?)")
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _text(message) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers like our agents would, with configurable latency
+
+    The call kind (router, tool planning, synthesis, summary) is recognised from
+    the prompt, so one instance can stand in for every Gemini call in the graph.
+    """
+
+    latencies: dict = DEFAULT_LATENCIES
+    jitter: float = 0.1
+    answer_words: int = 180
+    itinerary_queries: int = 2
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    # --- Script --- #
+    def _kind(self, messages) -> str:
+        system = _text(messages[0]) if isinstance(messages[0], SystemMessage) else ""
+        if "routing expert" in system:
+            return "router"
+        if len(messages) == 1 and _text(messages[0]).startswith("Update the running summary"):
+            return "summary"
+        if isinstance(messages[-1], ToolMessage):
+            return "synthesis"
+        return "plan"
+
+    def _agent(self, messages) -> str:
+        system = _text(messages[0]) if isinstance(messages[0], SystemMessage) else ""
+        if "flight booking expert" in system:
+            return "flight"
+        if "hotel booking expert" in system:
+            return "hotel"
+        return "itinerary"
+
+    def _last_user_text(self, messages) -> str:
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                return _text(message)
+        return ""
+
+    def _tool_calls(self, agent: str, query: str) -> list:
+        dates = ISO_DATE.findall(query) or ["2025-08-01", "2025-08-08"]
+        call_id = hashlib.md5(f"{agent}:{query}".encode()).hexdigest()[:8]
+        if agent == "flight":
+            pair = AIRPORT_PAIR.search(query)
+            origin, destination = pair.groups() if pair else ("JFK", "LHR")
+            return [{
+                "name": "search_flights",
+                "args": {"departure_airport": origin, "arrival_airport": destination, "outbound_date": dates[0],
+                         "return_date": dates[1] if len(dates) > 1 else None, "adults": 1},
+                "id": f"call_{call_id}_0",
+            }]
+        if agent == "hotel":
+            city = CITY.search(query)
+            check_out = dates[1] if len(dates) > 1 else dates[0]
+            return [{
+                "name": "search_hotels",
+                "args": {"location": city.group(1) if city else "Paris", "check_in_date": dates[0],
+                         "check_out_date": check_out, "adults": 2},
+                "id": f"call_{call_id}_0",
+            }]
+        return [
+            {"name": "tavily_search", "args": {"query": f"{query} ({topic})"}, "id": f"call_{call_id}_{i}"}
+            for i, topic in enumerate(["itinerary", "attractions", "food", "transport"][:self.itinerary_queries])
+        ]
+
+    def _respond(self, messages) -> tuple:
+        kind = self._kind(messages)
+        if kind == "router":
+            query = _text(messages[-1]).lower()
+            label = "FLIGHT" if "flight" in query or "airline" in query else "HOTEL" if "hotel" in query or "stay" in query else "ITINERARY"
+            return kind, AIMessage(content=label)
+        if kind == "summary":
+            return kind, AIMessage(content="User is planning a trip; earlier options were already presented.")
+        if kind == "synthesis":
+            words = " ".join(["option"] * self.answer_words)
+            return kind, AIMessage(content=f"Here is what I found for you: {words}.")
+        agent = self._agent(messages)
+        return kind, AIMessage(content="", tool_calls=self._tool_calls(agent, self._last_user_text(messages)))
+
+    def _finish(self, messages, kind: str, message: AIMessage) -> ChatResult:
+        input_tokens = sum(_estimate_tokens(_text(m)) for m in messages)
+        output_tokens = _estimate_tokens(_text(message) + json.dumps(message.tool_calls))
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        stats.record_llm(kind, input_tokens, output_tokens)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _delay(self, kind: str) -> float:
+        base = self.latencies.get(kind, 0.0)
+        return max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        kind, message = self._respond(messages)
+        time.sleep(self._delay(kind))
+        return self._finish(messages, kind, message)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        kind, message = self._respond(messages)
+        await asyncio.sleep(self._delay(kind))
+        return self._finish(messages, kind, message)
+
+# --- Provider stand-ins --- #
+def _price_factor(params: dict) -> float:
+    """Deterministic per-request price variation so different dates/cities return different fares"""
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).digest()
+    return 0.8 + (digest[0] / 255) * 0.4
+
+def fake_serpapi_send(latency: float):
+    """Stand-in for transport.providers["serpapi"].send"""
+    flights, hotels = load_fixture("flights.json"), load_fixture("hotels.json")
+
+    def send(method, path, params=None, json_body=None, timeout=None):
+        stats.record_provider("serpapi")
+        time.sleep(latency)
+        key_params = {k: v for k, v in params.items() if k != "api_key"}
+        factor = _price_factor(key_params)
+        if params.get("engine") == "google_flights":
+            data = copy.deepcopy(flights)
+            for option in data["best_flights"]:
+                option["price"] = round(option["price"] * factor)
+                for leg in option["flights"]:
+                    leg["departure_airport"]["time"] = f"{params['outbound_date']} {leg['departure_airport']['time'][-5:]}"
+        else:
+            data = copy.deepcopy(hotels)
+            for prop in data["properties"]:
+                rate = round(prop["rate_per_night"]["extracted_lowest"] * factor)
+                prop["rate_per_night"].update({"lowest": f"${rate}", "extracted_lowest": rate})
+        return data
+
+    return send
+
+def fake_tavily_send(latency: float):
+    """Stand-in for transport.providers["tavily"].send"""
+    tavily = load_fixture("tavily.json")
+
+    def send(method, path, params=None, json_body=None, timeout=None):
+        stats.record_provider("tavily")
+        time.sleep(latency)
+        return {**tavily, "query": json_body["query"]}
+
+    return send
+
+def install_fakes(latencies: dict = None, jitter: float = 0.1, seed: int = 7):
+    """Swaps Gemini, SerpAPI and Tavily for the offline stand-ins in this process"""
+    latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+    random.seed(seed)
+    for key in ("GOOGLE_API_KEY", "TAVILY_API_KEY", "SERPAPI_API_KEY"):
+        os.environ.setdefault(key, "offline-benchmark")
+
+    import llm_config
+    from rate_limits import limiters
+    llm_config.llm = ScriptedChatModel(latencies=latencies, jitter=jitter, rate_limiter=limiters["gemini"])
+
+    # Only the network step is replaced - deadlines, retries and the breaker still run
+    from transport import providers
+    providers["serpapi"].send = fake_serpapi_send(latencies["serpapi"])
+    providers["tavily"].send = fake_tavily_send(latencies["tavily"])
+    return stats
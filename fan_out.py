@@ -0,0 +1,52 @@
+from langchain_core.messages import AIMessage
+
+from state import TravelPlannerState
+from events import emit_event
+from history import prepare_history, aprepare_history
+from metrics import instrument_node
+
+# Section order and headings of a merged answer, keyed by the agent names used in run_tool_agent
+MERGE_SECTIONS = {
+    "flight": "✈️ Flights",
+    "hotel": "🏨 Hotels",
+    "itinerary": "🗺️ Itinerary",
+}
+
+def is_fan_out(state: TravelPlannerState) -> bool:
+    """True when the router sent this turn to several agents in parallel"""
+    return len(state.get("next_agents") or []) > 1
+
+def message_text(message) -> str:
+    """Plain text of a message whose content may be a list of content blocks"""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+    )
+
+@instrument_node("fan_out")
+def fan_out_node(state: TravelPlannerState):
+    """Folds old history once before the branches start, so parallel agents never race on the summary"""
+    _, history_update = prepare_history(state)
+    emit_event("fan_out", agents=state["next_agents"])
+    return history_update
+
+@instrument_node("fan_out")
+async def afan_out_node(state: TravelPlannerState):
+    """Fan-out node (async)"""
+    _, history_update = await aprepare_history(state)
+    emit_event("fan_out", agents=state["next_agents"])
+    return history_update
+
+@instrument_node("merge")
+def merge_node(state: TravelPlannerState):
+    """Combines the branch answers of a multi-intent turn into one reply"""
+    answers = {answer["agent"]: answer["content"] for answer in state.get("agent_answers") or []}
+    sections = [f"## {title}\n\n{answers[name]}" for name, title in MERGE_SECTIONS.items() if answers.get(name)]
+    print(f"🧩 Merged answers from: {', '.join(answers)}")
+    return {"messages": [AIMessage(content="\n\n".join(sections))]}
+
+async def amerge_node(state: TravelPlannerState):
+    """Merge node (async) - no I/O, so this just avoids a thread hop"""
+    return merge_node(state)
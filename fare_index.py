@@ -0,0 +1,289 @@
+"""Flexible-date fare index for flight and hotel follow-ups.
+
+Every flight and hotel search stores its normalized options here, per route
+(origin, destination, passengers, trip length) or per city (location, guests, rooms) and date.
+With FARE_PREFETCH_DAYS=N a search for date D also fetches D±1..N days in the
+background, keeping the trip length. "What about a day earlier?" or "anything
+cheaper that week?" is then answered by the query_flight_fares /
+query_hotel_rates tools from memory, with no provider call.
+
+Prefetching costs up to 2N extra SerpAPI searches per new route and date. They
+run on FARE_PREFETCH_WORKERS background threads, so they never hold more than
+that many of the provider's connection slots.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from cache import CACHE_TTLS, canonical_date, coerce_int, make_key, normalize_text
+from metrics import record_fare_prefetch, record_fare_query, register_gauge
+from projection import compact_json
+
+FARE_PREFETCH_DAYS = int(os.getenv("FARE_PREFETCH_DAYS", 0))
+FARE_PREFETCH_WORKERS = int(os.getenv("FARE_PREFETCH_WORKERS", 2))
+FARE_INDEX_MAX_ROUTES = int(os.getenv("FARE_INDEX_MAX_ROUTES", 512))
+MAX_QUERY_RESULTS = 10
+
+def parse_date(value):
+    try:
+        return datetime.strptime(canonical_date(value), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+def shift_date(value, days: int):
+    """value moved by `days` as YYYY-MM-DD, or None when it can't be parsed"""
+    parsed = parse_date(value)
+    return (parsed + timedelta(days=days)).isoformat() if parsed else None
+
+def prefetch_offsets() -> list:
+    """Nearest dates first: +1, -1, +2, -2, ..."""
+    return [sign * n for n in range(1, FARE_PREFETCH_DAYS + 1) for sign in (1, -1)]
+
+# --- Index --- #
+class FareIndex:
+    """Options per route and date, expiring with the matching tool cache's TTL
+
+    Routes are evicted least-recently-used beyond max_routes.
+    """
+
+    def __init__(self, name: str, ttl: float, max_routes: int = FARE_INDEX_MAX_ROUTES):
+        self.name = name
+        self.ttl = ttl
+        self.max_routes = max_routes
+        self._routes = OrderedDict() # route -> {(start, end): (fetched_at, entry)}
+        self._lock = threading.Lock()
+
+    def add(self, route: str, dates: tuple, entry: dict, merge_by: str = None):
+        """Stores the entry for dates; with merge_by, options are merged with the stored ones by that field"""
+        with self._lock:
+            entries = self._routes.setdefault(route, {})
+            self._routes.move_to_end(route)
+            stored = entries.get(dates)
+            if merge_by and stored and self._fresh(stored[0]):
+                options = {option[merge_by]: option for option in stored[1]["options"]}
+                options.update((option[merge_by], option) for option in entry["options"])
+                entry = {**entry, "options": list(options.values())}
+            entries[dates] = (time.monotonic(), entry)
+            while len(self._routes) > self.max_routes:
+                self._routes.popitem(last=False)
+
+    def _fresh(self, fetched_at: float) -> bool:
+        return time.monotonic() - fetched_at < self.ttl
+
+    def has(self, route: str, dates: tuple) -> bool:
+        with self._lock:
+            stored = self._routes.get(route, {}).get(dates)
+            return stored is not None and self._fresh(stored[0])
+
+    def entries(self, route: str) -> list:
+        """Fresh entries of a route, ordered by date - expired ones are dropped"""
+        with self._lock:
+            entries = self._routes.get(route)
+            if not entries:
+                return []
+            for dates in [d for d, (fetched_at, _) in entries.items() if not self._fresh(fetched_at)]:
+                del entries[dates]
+            self._routes.move_to_end(route)
+            return [entry for _, (_, entry) in sorted(entries.items())]
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._routes.values())
+
+flight_fares = FareIndex("flights", CACHE_TTLS["flights"])
+hotel_rates = FareIndex("hotels", CACHE_TTLS["hotels"])
+
+register_gauge("travel_fare_index_entries", "Route/date entries held per fare index",
+               lambda: [({"index": index.name}, index.size()) for index in (flight_fares, hotel_rates)])
+
+def trip_days(outbound_date, return_date):
+    """Days between outbound and return - None for a one-way trip"""
+    if not return_date:
+        return None
+    outbound, inbound = parse_date(outbound_date), parse_date(return_date)
+    return (inbound - outbound).days if outbound and inbound else canonical_date(return_date)
+
+def flight_route(departure_airport, arrival_airport, adults=1, children=0, trip_length=None) -> str:
+    """One-way fares and round trips of different lengths are separate routes - their prices don't compare"""
+    return make_key("route", {
+        "departure": str(departure_airport or "").strip().upper(),
+        "arrival": str(arrival_airport or "").strip().upper(),
+        "adults": coerce_int(adults, 1),
+        "children": coerce_int(children, 0),
+        "trip_length": trip_length,
+    })
+
+def hotel_area(location, adults=1, children=0, rooms=1) -> str:
+    return make_key("area", {
+        "location": normalize_text(location),
+        "adults": coerce_int(adults, 1),
+        "children": coerce_int(children, 0),
+        "rooms": coerce_int(rooms, 1),
+    })
+
+def index_flights(departure_airport, arrival_airport, outbound_date, return_date, adults, children, options: list):
+    """options are project_flight() dicts"""
+    outbound, inbound = canonical_date(outbound_date), canonical_date(return_date)
+    route = flight_route(departure_airport, arrival_airport, adults, children, trip_days(outbound_date, return_date))
+    flight_fares.add(route, (outbound, inbound or ""), {
+        "outbound_date": outbound,
+        "return_date": inbound,
+        "options": [{
+            "price": option.get("price"),
+            "stops": option.get("stops", 0),
+            "airlines": sorted({leg["airline"] for leg in option.get("legs", []) if leg.get("airline")}),
+            "departs": (option.get("legs") or [{}])[0].get("departs"),
+            "total_duration": option.get("total_duration"),
+        } for option in options if option.get("price") is not None],
+    })
+
+def index_hotels(location, check_in_date, check_out_date, adults, children, rooms, properties: list):
+    """properties are raw SerpAPI results - the numeric rates are only in the raw data"""
+    check_in, check_out = canonical_date(check_in_date), canonical_date(check_out_date)
+    hotel_rates.add(hotel_area(location, adults, children, rooms), (check_in or "", check_out or ""), {
+        "check_in_date": check_in,
+        "check_out_date": check_out,
+        "options": [{
+            "name": prop.get("name"),
+            "class": prop.get("extracted_hotel_class"),
+            "rating": prop.get("overall_rating"),
+            "rate_per_night": (prop.get("rate_per_night") or {}).get("extracted_lowest"),
+            "total_rate": (prop.get("total_rate") or {}).get("extracted_lowest"),
+        } for prop in properties if prop.get("name")],
+    }, merge_by="name")
+
+# --- Queries (the agents' local tools) --- #
+def _date_range(date_from, date_to):
+    start = canonical_date(date_from)
+    return start, canonical_date(date_to) if date_to else start
+
+def _float_or_none(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+def query_flight_fares(departure_airport: str, arrival_airport: str, date_from: str, date_to: str = None,
+                       trip_length_days: int = None, max_price: float = None, max_stops: int = None,
+                       adults: int = 1, children: int = 0) -> str:
+    """
+    Look up already-fetched flight fares for a route across a range of departure dates - no new search.
+
+    Use this for follow-ups such as "what about a day earlier/later?" or "anything cheaper that week?"
+    on a route that was already searched. Call search_flights when it reports no matching fares.
+
+    Args:
+        departure_airport: Departure airport code (e.g., 'JFK')
+        arrival_airport: Arrival airport code (e.g., 'LHR')
+        date_from: First departure date to consider (YYYY-MM-DD)
+        date_to: Last departure date to consider (YYYY-MM-DD, default: date_from)
+        trip_length_days: Days between departure and return of the round trip searched; omit for one-way fares
+        max_price: Only fares at or below this price in USD
+        max_stops: Only options with at most this many stops (0 for direct)
+        adults: Number of adult passengers (default: 1)
+        children: Number of child passengers (default: 0)
+    """
+    start, end = _date_range(date_from, date_to)
+    max_price, max_stops = _float_or_none(max_price), _float_or_none(max_stops)
+    trip_length = coerce_int(trip_length_days, None)
+    entries = flight_fares.entries(flight_route(departure_airport, arrival_airport, adults, children, trip_length))
+    rows = [
+        {"outbound_date": entry["outbound_date"], "return_date": entry["return_date"], **option}
+        for entry in entries if start <= entry["outbound_date"] <= end
+        for option in entry["options"]
+        if (max_price is None or option["price"] <= max_price) and (max_stops is None or option["stops"] <= max_stops)
+    ]
+    record_fare_query("flights", bool(rows))
+    indexed = sorted({entry["outbound_date"] for entry in entries})
+    if not rows:
+        trip = f"{trip_length}-day round trip" if trip_length is not None else "one-way"
+        return (f"No indexed {trip} fares for {departure_airport}→{arrival_airport} departing {start}..{end} with those filters "
+                f"(indexed departure dates: {', '.join(indexed) or 'none'}). Use search_flights for other dates.")
+    rows.sort(key=lambda row: (row["price"], row["stops"]))
+    return compact_json({"indexed_departure_dates": indexed, "fares": rows[:MAX_QUERY_RESULTS]})
+
+def query_hotel_rates(location: str, date_from: str, date_to: str = None, max_price_per_night: float = None,
+                      min_rating: float = None, min_class: int = None, adults: int = 1, children: int = 0, rooms: int = 1) -> str:
+    """
+    Look up already-fetched hotel rates in a city across a range of check-in dates - no new search.
+
+    Use this for follow-ups such as "what about checking in a day later?" or "anything cheaper that week?"
+    in a city that was already searched. Call search_hotels when it reports no matching rates.
+
+    Args:
+        location: City or area that was searched (e.g., 'Paris')
+        date_from: First check-in date to consider (YYYY-MM-DD)
+        date_to: Last check-in date to consider (YYYY-MM-DD, default: date_from)
+        max_price_per_night: Only rates at or below this nightly price in USD
+        min_rating: Only hotels rated at least this (e.g., 4.2)
+        min_class: Only hotels of at least this star class
+        adults: Number of adults (default: 1)
+        children: Number of children (default: 0)
+        rooms: Number of rooms (default: 1)
+    """
+    start, end = _date_range(date_from, date_to)
+    max_price, min_rating, min_class = _float_or_none(max_price_per_night), _float_or_none(min_rating), _float_or_none(min_class)
+    entries = hotel_rates.entries(hotel_area(location, adults, children, rooms))
+    rows = [
+        {"check_in_date": entry["check_in_date"], "check_out_date": entry["check_out_date"], **option}
+        for entry in entries if start <= entry["check_in_date"] <= end
+        for option in entry["options"]
+        if option["rate_per_night"] is not None
+        and (max_price is None or option["rate_per_night"] <= max_price)
+        and (min_rating is None or (option["rating"] or 0) >= min_rating)
+        and (min_class is None or (option["class"] or 0) >= min_class)
+    ]
+    record_fare_query("hotels", bool(rows))
+    indexed = sorted({entry["check_in_date"] for entry in entries})
+    if not rows:
+        return (f"No indexed hotel rates in {location} for check-in {start}..{end} with those filters "
+                f"(indexed check-in dates: {', '.join(indexed) or 'none'}). Use search_hotels for other dates.")
+    rows.sort(key=lambda row: row["rate_per_night"])
+    return compact_json({"indexed_check_in_dates": indexed, "rates": rows[:MAX_QUERY_RESULTS]})
+
+# --- Background prefetch --- #
+class Prefetcher:
+    """Runs neighbouring-date searches on a small background pool, each key at most once at a time"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, index_name: str, key: str, func):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fare-prefetch")
+        # Not run in the caller's context - background searches stay out of the user's turn breakdown
+        self._executor.submit(self._run, index_name, key, func)
+
+    def _run(self, index_name: str, key: str, func):
+        try:
+            func()
+            record_fare_prefetch(index_name, "ok")
+        except Exception as e:
+            record_fare_prefetch(index_name, "error")
+            print(f"⚠️ Prefetch for {index_name} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+prefetcher = Prefetcher(FARE_PREFETCH_WORKERS)
+
+def prefetch_dates(start_date, end_date):
+    """(start, end) pairs around a search, trip length kept, today or later only"""
+    today = date.today().isoformat()
+    pairs = []
+    for offset in prefetch_offsets():
+        start = shift_date(start_date, offset)
+        if start is None or start < today:
+            continue
+        pairs.append((start, shift_date(end_date, offset) if end_date else None))
+    return pairs
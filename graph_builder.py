@@ -1,48 +1,167 @@
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import InMemorySaver
+import os
+import atexit
+import importlib
+import threading
 from typing import Literal
 
+from langgraph.constants import END
+
 from state import TravelPlannerState
-from agents import itinerary_agent_node, flight_agent_node, hotel_agent_node
-from router import router_node # Assuming router_node now creates the router internally or accesses a global one
+from fan_out import is_fan_out
+
+# Importing this module is cheap: LangGraph, the agents and every client are loaded by
+# build_travel_planner() on first use. `from graph_builder import travel_planner` still
+# works and returns the planner for the environment's default config.
+
+AGENT_NODES = ["flight_agent", "hotel_agent", "itenary_agent"]
+
+# Third-party modules whose import dominates cold start - see startup_benchmark.py
+HEAVY_MODULES = ["langgraph.graph", "langchain_google_genai", "langchain_tavily", "langchain.tools", "requests"]
 
 # Conditional routing function
-def route_to_agent(state: TravelPlannerState) -> Literal["flight_agent", "hotel_agent", "itenary_agent"]:
+def route_to_agent(state: TravelPlannerState) -> Literal["flight_agent", "hotel_agent", "itenary_agent", "fan_out"]:
     """Conditional edge function - routes to appropriate agent based on router decision"""
+    # Multi-intent queries go through fan_out, which starts one branch per agent
+    if is_fan_out(state):
+        return "fan_out"
     # The router_node already sets 'next_agent', so we just return it
     return state["next_agent"]
 
-# Build the complete travel planning graph
-workflow = StateGraph(TravelPlannerState)
-
-# Add all nodes to the graph
-workflow.add_node("router", router_node)
-workflow.add_node("flight_agent", flight_agent_node)
-workflow.add_node("hotel_agent", hotel_agent_node)
-workflow.add_node("itenary_agent", itinerary_agent_node)
-
-# Set entry point - always start with router
-workflow.set_entry_point("router")
-
-# Add conditional edge from router to appropriate agent
-workflow.add_conditional_edges(
-    "router",
-    route_to_agent, # Use the conditional function here
-    {
-        "flight_agent": "flight_agent",
-        "hotel_agent": "hotel_agent",
-        "itenary_agent": "itenary_agent"
+def dispatch_agents(state: TravelPlannerState) -> list:
+    """Conditional edge function - every routed agent runs as a parallel branch"""
+    return state["next_agents"]
+
+def after_agent(state: TravelPlannerState) -> str:
+    """Conditional edge function - fan-out branches meet in the merge node, a single agent ends the turn"""
+    return "merge" if is_fan_out(state) else END
+
+def build_workflow():
+    """Builds the (uncompiled) travel planning graph - no clients are created here"""
+    from langgraph.graph import StateGraph
+    from langchain_core.runnables import RunnableLambda
+
+    from agents import (
+        itinerary_agent_node, aitinerary_agent_node,
+        flight_agent_node, aflight_agent_node,
+        hotel_agent_node, ahotel_agent_node,
+    )
+    from router import router_node, arouter_node
+    from fan_out import fan_out_node, afan_out_node, merge_node, amerge_node
+
+    # Build the complete travel planning graph
+    workflow = StateGraph(TravelPlannerState)
+
+    # Add all nodes to the graph - each node has a sync and an async implementation,
+    # so travel_planner.invoke and travel_planner.ainvoke both work without blocking
+    workflow.add_node("router", RunnableLambda(router_node, afunc=arouter_node, name="router"))
+    workflow.add_node("flight_agent", RunnableLambda(flight_agent_node, afunc=aflight_agent_node, name="flight_agent"))
+    workflow.add_node("hotel_agent", RunnableLambda(hotel_agent_node, afunc=ahotel_agent_node, name="hotel_agent"))
+    workflow.add_node("itenary_agent", RunnableLambda(itinerary_agent_node, afunc=aitinerary_agent_node, name="itenary_agent"))
+    workflow.add_node("fan_out", RunnableLambda(fan_out_node, afunc=afan_out_node, name="fan_out"))
+    workflow.add_node("merge", RunnableLambda(merge_node, afunc=amerge_node, name="merge"))
+
+    # Set entry point - always start with router
+    workflow.set_entry_point("router")
+
+    # Add conditional edge from router to appropriate agent
+    workflow.add_conditional_edges(
+        "router",
+        route_to_agent, # Use the conditional function here
+        {
+            "flight_agent": "flight_agent",
+            "hotel_agent": "hotel_agent",
+            "itenary_agent": "itenary_agent",
+            "fan_out": "fan_out"
+        }
+    )
+
+    # Multi-intent turns: all routed agents run concurrently in the same step
+    workflow.add_conditional_edges("fan_out", dispatch_agents, AGENT_NODES)
+
+    # Each agent ends the turn, or hands its answer to the merge node when fanned out.
+    # Branches finish in the same step, so merge runs once after the slowest of them
+    for agent_node in AGENT_NODES:
+        workflow.add_conditional_edges(agent_node, after_agent, {"merge": "merge", END: END})
+    workflow.add_edge("merge", END)
+    return workflow
+
+def default_config() -> dict:
+    """Planner config from the environment
+
+    checkpointer is "sqlite" (durable, bounded - when CHECKPOINT_DB is set), "memory"
+    (conversations live in process memory only) or "none" (independent single turns).
+    """
+    return {
+        "checkpointer": "sqlite" if os.getenv("CHECKPOINT_DB") else "memory",
+        "checkpoint_db": os.getenv("CHECKPOINT_DB"),
+        "max_checkpoints_per_thread": int(os.getenv("CHECKPOINT_MAX_PER_THREAD", 20)),
+        "thread_ttl": float(os.environ["CHECKPOINT_THREAD_TTL"]) if os.getenv("CHECKPOINT_THREAD_TTL") else None,
+        "max_threads": int(os.environ["CHECKPOINT_MAX_THREADS"]) if os.getenv("CHECKPOINT_MAX_THREADS") else None,
     }
-)
 
-# Add edges from each agent back to END
-workflow.add_edge("flight_agent", END)
-workflow.add_edge("hotel_agent", END)
-workflow.add_edge("itenary_agent", END)
+def make_checkpointer(config: dict):
+    if config["checkpointer"] == "none":
+        return None
+    if config["checkpointer"] == "sqlite":
+        from checkpoint_store import SqliteCheckpointStore
+
+        checkpointer = SqliteCheckpointStore(
+            config["checkpoint_db"],
+            max_checkpoints_per_thread=config["max_checkpoints_per_thread"],
+            thread_ttl=config["thread_ttl"],
+            max_threads=config["max_threads"],
+        )
+        atexit.register(checkpointer.close)
+        return checkpointer
+
+    from langgraph.checkpoint.memory import InMemorySaver
+    return InMemorySaver()
+
+_planners = {}
+_build_lock = threading.Lock()
+
+def build_travel_planner(config: dict = None):
+    """Returns the compiled travel planning graph, building it on first use
+
+    config overrides keys of default_config(). One graph (and checkpointer) is
+    built per distinct config and reused by every later call.
+    """
+    config = {**default_config(), **(config or {})}
+    key = tuple(sorted(config.items()))
+    with _build_lock:
+        planner = _planners.get(key)
+        if planner is None:
+            # Compile the graph
+            planner = _planners[key] = build_workflow().compile(checkpointer=make_checkpointer(config))
+            print("✅ Travel Planning Graph built successfully!")
+    return planner
+
+def warm_up(config: dict = None, pre_fork: bool = False):
+    """Pays the cold-start cost before the first request arrives
+
+    pre_fork=True only imports modules and builds the graph structure. It creates no
+    network clients, threads or SQLite connections, none of which survive a fork.
+    Call it in the parent process of a pre-forking server, then warm_up() in each
+    worker (or just warm_up() in a single-process server). Returns the planner,
+    or None when pre_fork is set.
+    """
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+    if pre_fork:
+        build_workflow()
+        return None
 
-checkpointer = InMemorySaver()
+    from llm_config import get_llm
+    from agents import build_agent_chains
+    from router import get_router_chain
 
-# Compile the graph
-travel_planner = workflow.compile(checkpointer=checkpointer)
+    planner = build_travel_planner(config)
+    get_llm()
+    build_agent_chains()
+    get_router_chain()
+    return planner
 
-print("✅ Travel Planning Graph built successfully!")
\ No newline at end of file
+def __getattr__(name):
+    if name == "travel_planner":
+        return build_travel_planner()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,183 @@
+import os
+
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
+
+from projection import estimate_tokens
+from metrics import timed_llm
+
+# Approximate token budget for the conversation history sent with each agent call
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 6000))
+# When over budget, fold old turns until history is back under this share of the budget,
+# so the summarizer runs every few turns instead of on every turn
+HISTORY_FOLD_TARGET = 0.6
+# Most recent turns (including the current one) that are never folded into the summary
+MIN_RECENT_TURNS = 2
+# Previous turns whose raw tool results are kept; older ones are stubbed out
+KEEP_TOOL_RESULT_TURNS = 1
+# "llm" summarizes folded turns with Gemini, "local" builds an extractive summary without a model call
+HISTORY_SUMMARIZER = os.getenv("HISTORY_SUMMARIZER", "llm")
+
+# The extractive summary keeps only its most recent lines beyond this size
+MAX_LOCAL_SUMMARY_CHARS = 2000
+
+TOOL_RESULT_STUB = "[Earlier search result omitted - search again if the details are needed]"
+SUMMARY_PREFIX = "Summary of the earlier conversation with this user:\n"
+# Keeps summarizer tokens out of stream_mode="messages" so they never reach the user
+SUMMARIZER_CONFIG = {"tags": ["nostream"]}
+
+SUMMARIZER_PROMPT = """Update the running summary of a travel-planning conversation.
+Keep every fact the assistant may need later: destinations, dates, travellers, budgets, preferences,
+and the specific flights, hotels or plans already recommended (with prices). Be concise - at most 200 words.
+
+Current summary:
+{summary}
+
+New conversation to fold in:
+{transcript}
+
+Updated summary:"""
+
+def message_tokens(message) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    tokens = estimate_tokens(content) + 4
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += estimate_tokens(str(message.tool_calls))
+    return tokens
+
+def split_turns(messages) -> list:
+    """Groups messages into turns, each starting at a HumanMessage - keeps tool calls with their results"""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def stub_tool_results(turn: list) -> list:
+    return [
+        ToolMessage(content=TOOL_RESULT_STUB, tool_call_id=m.tool_call_id, name=m.name, id=m.id)
+        if isinstance(m, ToolMessage) and m.content != TOOL_RESULT_STUB else m
+        for m in turn
+    ]
+
+def transcript(messages) -> str:
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {message.content}")
+        elif isinstance(message, AIMessage) and message.content:
+            lines.append(f"Assistant: {message.content}")
+    return "\n".join(lines)
+
+def local_summary(summary: str, folded) -> str:
+    """Extractive fallback - user requests and the start of each answer"""
+    lines = summary.splitlines() if summary else []
+    for message in folded:
+        if isinstance(message, HumanMessage):
+            lines.append(f"- User asked: {message.content[:200]}")
+        elif isinstance(message, AIMessage) and isinstance(message.content, str) and message.content:
+            lines.append(f"  Assistant answered: {message.content[:300]}")
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > MAX_LOCAL_SUMMARY_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+def _summarizer_input(summary: str, folded) -> str:
+    return SUMMARIZER_PROMPT.format(summary=summary or "(none)", transcript=transcript(folded))
+
+def summarize(summary: str, folded) -> str:
+    if HISTORY_SUMMARIZER != "llm":
+        return local_summary(summary, folded)
+    try:
+        from llm_config import llm
+        with timed_llm("history.summary") as call:
+            call.message = llm.invoke(_summarizer_input(summary, folded), SUMMARIZER_CONFIG)
+        updated = call.message.content
+        if isinstance(updated, str) and updated.strip():
+            return updated.strip()
+        raise ValueError("empty summary")
+    except Exception as e:
+        print(f"⚠️ History summarizer failed, using local summary: {e}")
+        return local_summary(summary, folded)
+
+async def asummarize(summary: str, folded) -> str:
+    if HISTORY_SUMMARIZER != "llm":
+        return local_summary(summary, folded)
+    try:
+        from llm_config import llm
+        with timed_llm("history.summary") as call:
+            call.message = await llm.ainvoke(_summarizer_input(summary, folded), SUMMARIZER_CONFIG)
+        updated = call.message.content
+        if isinstance(updated, str) and updated.strip():
+            return updated.strip()
+        raise ValueError("empty summary")
+    except Exception as e:
+        print(f"⚠️ History summarizer failed, using local summary: {e}")
+        return local_summary(summary, folded)
+
+def plan_history(state, budget: int = HISTORY_TOKEN_BUDGET):
+    """Returns (folded_messages, kept_turns, summarized_count) for the current state
+
+    Messages before summarized_count are already covered by state["summary"].
+    """
+    messages = state["messages"]
+    summarized_count = min(state.get("summarized_count") or 0, len(messages))
+    turns = split_turns(messages[summarized_count:])
+
+    # Stub tool payloads of all but the most recent previous turns
+    stub_before = len(turns) - 1 - KEEP_TOOL_RESULT_TURNS
+    turns = [stub_tool_results(turn) if i < stub_before else turn for i, turn in enumerate(turns)]
+
+    total = sum(message_tokens(m) for turn in turns for m in turn)
+    if total <= budget:
+        return [], turns, summarized_count
+
+    folded = []
+    target = budget * HISTORY_FOLD_TARGET
+    while len(turns) > MIN_RECENT_TURNS and total > target:
+        turn = turns.pop(0)
+        total -= sum(message_tokens(m) for m in turn)
+        summarized_count += len(turn)
+        folded.extend(turn)
+    return folded, turns, summarized_count
+
+def _assemble(summary: str, turns) -> list:
+    messages = [SystemMessage(content=SUMMARY_PREFIX + summary)] if summary else []
+    for turn in turns:
+        messages.extend(turn)
+    return messages
+
+def peek_history(state, budget: int = HISTORY_TOKEN_BUDGET):
+    """The messages prepare_history would build, or None when old turns must be folded first
+
+    Never summarizes, so it is safe to call before the turn's agent is known.
+    """
+    folded, turns, _ = plan_history(state, budget)
+    if folded:
+        return None
+    return _assemble(state.get("summary") or "", turns)
+
+def prepare_history(state, budget: int = HISTORY_TOKEN_BUDGET):
+    """Builds the token-budgeted message list for an agent call
+
+    Returns (messages, state_update). state_update carries the new running summary
+    when old turns were folded, and is empty otherwise.
+    """
+    folded, turns, summarized_count = plan_history(state, budget)
+    summary = state.get("summary") or ""
+    update = {}
+    if folded:
+        summary = summarize(summary, folded)
+        update = {"summary": summary, "summarized_count": summarized_count}
+        print(f"🗜️ Folded {len(folded)} earlier messages into the conversation summary")
+    return _assemble(summary, turns), update
+
+async def aprepare_history(state, budget: int = HISTORY_TOKEN_BUDGET):
+    """Async version of prepare_history"""
+    folded, turns, summarized_count = plan_history(state, budget)
+    summary = state.get("summary") or ""
+    update = {}
+    if folded:
+        summary = await asummarize(summary, folded)
+        update = {"summary": summary, "summarized_count": summarized_count}
+        print(f"🗜️ Folded {len(folded)} earlier messages into the conversation summary")
+    return _assemble(summary, turns), update
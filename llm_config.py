@@ -1,8 +1,23 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 
-# Initialize the LLM (ensure GOOGLE_API_KEY is set in environment)
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    temperature=0.2
-)
+# The Gemini client is created on first use (ensure GOOGLE_API_KEY is set by then), so
+# importing this module stays cheap. `from llm_config import llm` still works and
+# returns the shared client; assigning llm_config.llm replaces it (see fakes.py).
+def get_llm():
+    """Returns the shared Gemini client, creating it on first use"""
+    llm = globals().get("llm")
+    if llm is None:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from rate_limits import limiters
+
+        llm = globals()["llm"] = ChatGoogleGenerativeAI(
+            model="gemini-2.0-flash",
+            temperature=0.2,
+            rate_limiter=limiters["gemini"], # GEMINI_RPS, unlimited when unset
+        )
+    return llm
+
+def __getattr__(name):
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,24 +1,27 @@
 import os
 import getpass
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessage
 
-# Relative import for the travel_planner graph
+from metrics import start_turn
 
 # --- Environment Setup (Crucial to run first) ---
-load_dotenv() # Load any existing .env file
-
-# Prompt for API keys if not already set in environment variables
-# For deployment, these should be securely managed, not hardcoded or prompted interactively.
-if not os.getenv("GOOGLE_API_KEY"): os.environ["GOOGLE_API_KEY"] = getpass.getpass("GOOGLE_API_KEY")
-if not os.getenv("TAVILY_API_KEY"): os.environ["TAVILY_API_KEY"] = getpass.getpass("TAVILY_API_KEY")
-if not os.getenv("SERPAPI_API_KEY"): os.environ["SERPAPI_API_KEY"] = getpass.getpass("SERPAPI_API_KEY")
-print("Environment variables loaded.\n")
+def load_environment():
+    """Loads .env and prompts for any missing API keys - call before building the graph"""
+    load_dotenv() # Load any existing .env file
+
+    # Prompt for API keys if not already set in environment variables
+    # For deployment, these should be securely managed, not hardcoded or prompted interactively.
+    if not os.getenv("GOOGLE_API_KEY"): os.environ["GOOGLE_API_KEY"] = getpass.getpass("GOOGLE_API_KEY")
+    if not os.getenv("TAVILY_API_KEY"): os.environ["TAVILY_API_KEY"] = getpass.getpass("TAVILY_API_KEY")
+    if not os.getenv("SERPAPI_API_KEY"): os.environ["SERPAPI_API_KEY"] = getpass.getpass("SERPAPI_API_KEY")
+    print("Environment variables loaded.\n")
 # --------------------------------------------------
-from graph_builder import travel_planner
 
 def test_system(query):
     """Test our multi-agent system"""
+    from graph_builder import travel_planner
+
     print(f"🧑 User: {query}")
 
     # Create initial state
@@ -35,13 +38,49 @@ def test_system(query):
     print(f"\n🤖 Assistant: {response}")
     print("-" * 50)
 
+TOOL_LABELS = {
+    "search_flights": "Searching flights",
+    "search_hotels": "Searching hotels",
+}
+
+def stream_turn(inputs, config):
+    """Runs one turn with token streaming - prints progress events and answer tokens as they arrive"""
+    from graph_builder import travel_planner
+
+    printed_answer = False
+    for mode, chunk in travel_planner.stream(inputs, config, stream_mode=["messages", "custom"]):
+        if mode == "custom":
+            # The router prints its own decision, so only tool progress is shown here
+            event = chunk.get("event")
+            if event == "tool_start":
+                print(f"🔎 {TOOL_LABELS.get(chunk['tool'], 'Searching the web')}...")
+            elif event == "tool_end" and not chunk.get("ok"):
+                print(f"⚠️ {chunk['tool']} failed")
+            continue
+
+        message, metadata = chunk
+        # Only stream agent answers - skip the router's one-word label and raw tool results
+        if metadata.get("langgraph_node") == "router" or not isinstance(message, AIMessage):
+            continue
+        if isinstance(message.content, str) and message.content:
+            if not printed_answer:
+                print("\n🤖 Assistant: ", end="", flush=True)
+                printed_answer = True
+            print(message.content, end="", flush=True)
+
+    if not printed_answer:
+        # Nothing was streamed (e.g. the model returned content blocks) - fall back to the final state
+        response = travel_planner.get_state(config).values["messages"][-1].content
+        print(f"\n🤖 Assistant: {response}", end="")
+    print()
+
 def multi_turn_chat():
     """Multi-turn conversation with checkpoint memory"""
     print("💬 Multi-Agent Travel Assistant (Multi-turn Mode)")
     print("=" * 50)
 
     # For multi-turn, you need a consistent thread/session ID
-    # The InMemorySaver uses this. For persistent memory, use SQLiteSaver.
+    # The checkpointer uses this. For persistent memory, set CHECKPOINT_DB (see checkpoint_store.py).
     config = {"configurable": {"thread_id": "1"}}
 
     while True:
@@ -55,17 +94,17 @@ def multi_turn_chat():
 
         # For multi-turn, just add the new message
         # The graph will maintain conversation history automatically using the checkpointer
-        result = travel_planner.invoke(
-            {"messages": [HumanMessage(content=user_input)]},
-            config
-        )
-
-        response = result["messages"][-1].content
-        print(f"\n🤖 Assistant: {response}")
+        recorder = start_turn()
+        stream_turn({"messages": [HumanMessage(content=user_input)]}, config)
+        # Set SHOW_TURN_BREAKDOWN=1 to see where the time (and tokens) went
+        if os.getenv("SHOW_TURN_BREAKDOWN"):
+            print(recorder.breakdown())
         print("-" * 50)
 
 # --- Run the chatbot ---
 if __name__ == "__main__":
+    load_environment()
+
     # You can uncomment these for quick tests
     # test_system("I need to book a flight to Paris")
     # test_system("Find me a good hotel in New Delhi on 15 July 2025 for 1 night for 1 adult")
@@ -0,0 +1,293 @@
+"""Instrumentation for the travel planner: timings, token usage, tool latency and cache hits.
+
+Metrics are exported in Prometheus text format (render_prometheus, served at
+GET /metrics by server.py). Set METRICS_LOG=stderr or METRICS_LOG=<file> to also
+emit one structured JSON log line per event. A TurnRecorder collects the events
+of a single turn for the CLI's per-turn breakdown.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: tuple, extra: dict = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_format_labels(key)} {value:g}" for key, value in sorted(self._values.items())]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': f'{bound:g}'})} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+# --- Metric definitions --- #
+node_duration = Histogram("travel_node_duration_seconds", "Wall time per graph node")
+llm_duration = Histogram("travel_llm_call_duration_seconds", "Wall time per LLM call")
+llm_tokens = Counter("travel_llm_tokens_total", "LLM tokens from Gemini usage metadata")
+tool_duration = Histogram("travel_tool_call_duration_seconds", "Wall time per tool call")
+tool_payload = Histogram("travel_tool_payload_bytes", "Size of tool results sent back to the LLM", BYTES_BUCKETS)
+cache_lookups = Counter("travel_cache_lookups_total", "Tool and response cache lookups by result")
+route_decisions = Counter("travel_route_decisions_total", "Router decisions by deciding path")
+speculations = Counter("travel_speculations_total", "Speculative agent steps by outcome")
+speculation_saved = Counter("travel_speculation_saved_seconds_total", "Turn latency saved by speculative agent steps")
+provider_requests = Counter("travel_provider_requests_total", "Search provider HTTP attempts by outcome")
+provider_duration = Histogram("travel_provider_request_duration_seconds", "Wall time per search provider HTTP attempt")
+single_flight_calls = Counter("travel_single_flight_calls_total",
+                              "Search calls by single-flight role - followers shared a leader's upstream request")
+fare_prefetches = Counter("travel_fare_prefetch_total", "Background neighbouring-date searches by outcome")
+fare_queries = Counter("travel_fare_index_queries_total", "Local fare index lookups by result")
+cache_bypasses = Counter("travel_response_cache_bypasses_total", "Requests that skipped the response cache by reason")
+
+REGISTRY = [node_duration, llm_duration, llm_tokens, tool_duration, tool_payload, cache_lookups, route_decisions,
+            speculations, speculation_saved, cache_bypasses, provider_requests, provider_duration, single_flight_calls,
+            fare_prefetches, fare_queries]
+
+# Extra gauge sources rendered at scrape time: name -> (help, fn yielding (labels_dict, value) pairs)
+_gauges = {}
+
+def register_gauge(name: str, help_text: str, fn):
+    _gauges[name] = (help_text, fn)
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    for name, (help_text, fn) in _gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        try:
+            lines += [f"{name}{_format_labels(_label_key(labels))} {value:g}" for labels, value in fn()]
+        except Exception as e:
+            lines.append(f"# {name} unavailable: {e}")
+    return "\n".join(lines) + "\n"
+
+# --- Structured JSON logs --- #
+_logger = logging.getLogger("travel_planner.metrics")
+if os.getenv("METRICS_LOG"):
+    _handler = logging.StreamHandler(sys.stderr) if os.environ["METRICS_LOG"] == "stderr" else logging.FileHandler(os.environ["METRICS_LOG"])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.addHandler(_handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+
+# --- Per-turn breakdown --- #
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+class TurnRecorder:
+    """Collects the timed events of one conversation turn"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def add(self, event: dict):
+        with self._lock:
+            self.events.append(event)
+
+    def breakdown(self) -> str:
+        total = time.perf_counter() - self.started
+        lines = [f"⏱️ Turn breakdown ({total:.2f}s total)"]
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            if event["kind"] == "cache":
+                lines.append(f"   cache  {event['name']:<28} {'hit' if event['hit'] else 'miss'}")
+                continue
+            if event["kind"] == "cache_bypass":
+                lines.append(f"   cache  {event['name']:<28} bypass ({event['reason']})")
+                continue
+            if event["kind"] == "coalesced":
+                lines.append(f"   cache  {event['name']:<28} joined an in-flight search")
+                continue
+            if event["kind"] == "spec":
+                lines.append(f"   spec   {event['name']:<28} {event['result']}, saved {event['saved']:.3f}s")
+                continue
+            detail = ""
+            if event.get("prompt_tokens") is not None:
+                detail = f" tokens {event['prompt_tokens']}→{event['completion_tokens']}"
+            if event.get("bytes") is not None:
+                detail = f" {event['bytes']} bytes" + ("" if event.get("ok", True) else " (failed)")
+            lines.append(f"   {event['kind']:<6} {event['name']:<28} {event['duration']:.3f}s{detail}")
+        return "\n".join(lines)
+
+    def totals(self) -> dict:
+        """Aggregate timings and token counts of the turn, e.g. for batch result rows"""
+        totals = {"llm_calls": 0, "llm_s": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+                  "tool_calls": 0, "tool_s": 0.0, "cache_hits": 0, "cache_misses": 0, "coalesced_calls": 0}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            if event["kind"] == "llm":
+                totals["llm_calls"] += 1
+                totals["llm_s"] += event["duration"]
+                totals["prompt_tokens"] += event["prompt_tokens"] or 0
+                totals["completion_tokens"] += event["completion_tokens"] or 0
+            elif event["kind"] == "tool":
+                totals["tool_calls"] += 1
+                totals["tool_s"] += event["duration"]
+            elif event["kind"] == "cache":
+                totals["cache_hits" if event["hit"] else "cache_misses"] += 1
+            elif event["kind"] == "coalesced":
+                totals["coalesced_calls"] += 1
+        return totals
+
+def start_turn() -> TurnRecorder:
+    """Starts recording events for the current turn in this context"""
+    recorder = TurnRecorder()
+    _current_turn.set(recorder)
+    return recorder
+
+def record_event(kind: str, name: str, **data):
+    event = {"kind": kind, "name": name, **data}
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.add(event)
+    if _logger.handlers:
+        _logger.info(json.dumps({"ts": time.time(), **event}, default=str))
+
+# --- Recording helpers --- #
+def record_node(name: str, duration: float):
+    node_duration.observe(duration, node=name)
+    record_event("node", name, duration=duration)
+
+def record_llm_call(name: str, duration: float, message=None):
+    """Records an LLM call - token counts come from the AIMessage usage_metadata when present"""
+    llm_duration.observe(duration, call=name)
+    usage = getattr(message, "usage_metadata", None) or {}
+    prompt_tokens, completion_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+    if prompt_tokens is not None:
+        llm_tokens.inc(prompt_tokens, call=name, kind="prompt")
+        llm_tokens.inc(completion_tokens or 0, call=name, kind="completion")
+    record_event("llm", name, duration=duration, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+def record_tool_call(name: str, duration: float, content: str, ok: bool):
+    size = len(content.encode()) if isinstance(content, str) else 0
+    tool_duration.observe(duration, tool=name, status="ok" if ok else "error")
+    tool_payload.observe(size, tool=name)
+    record_event("tool", name, duration=duration, bytes=size, ok=ok)
+
+def record_cache_lookup(cache_name: str, hit: bool):
+    cache_lookups.inc(cache=cache_name, result="hit" if hit else "miss")
+    record_event("cache", cache_name, hit=hit)
+
+def record_cache_bypass(cache_name: str, reason: str):
+    cache_bypasses.inc(cache=cache_name, reason=reason)
+    record_event("cache_bypass", cache_name, reason=reason)
+
+def record_provider_request(provider: str, outcome: str, duration: float = None):
+    """outcome is "ok", "retry", "error", "deadline", "queue_timeout" or "circuit_open" """
+    provider_requests.inc(provider=provider, outcome=outcome)
+    if duration is not None:
+        provider_duration.observe(duration, provider=provider)
+
+def record_single_flight(name: str, role: str):
+    """role is "leader" (made the upstream call) or "follower" (coalesced into it)"""
+    single_flight_calls.inc(search=name, role=role)
+    if role == "follower":
+        record_event("coalesced", name)
+
+def record_fare_prefetch(index: str, result: str):
+    fare_prefetches.inc(index=index, result=result)
+
+def record_fare_query(index: str, hit: bool):
+    fare_queries.inc(index=index, result="hit" if hit else "miss")
+    record_event("cache", f"fare_index.{index}", hit=hit)
+
+def record_route(next_agent: str, route_source: str):
+    route_decisions.inc(agent=next_agent, source=route_source)
+
+def record_speculation(agent: str, result: str, saved: float = 0.0):
+    """result is "hit", "miss", "skipped" or "error"; saved is the latency the overlap removed"""
+    speculations.inc(agent=agent, result=result)
+    if saved:
+        speculation_saved.inc(saved, agent=agent)
+    record_event("spec", agent, result=result, saved=saved)
+
+@contextmanager
+def timed_llm(name: str):
+    """Times an LLM call - set .message on the yielded holder to capture token usage"""
+    holder = type("LLMCall", (), {"message": None})()
+    start = time.perf_counter()
+    try:
+        yield holder
+    finally:
+        record_llm_call(name, time.perf_counter() - start, holder.message)
+
+def instrument_node(name: str):
+    """Decorator recording wall time for a sync or async graph node"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record_node(name, time.perf_counter() - start)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_node(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
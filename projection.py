@@ -0,0 +1,135 @@
+import os
+import json
+import logging
+import threading
+
+# Rough chars-per-token ratio for Gemini on JSON payloads - good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Per-tool budgets (approximate tokens) for a single tool result
+TOKEN_BUDGETS = {
+    "search_flights": int(os.getenv("FLIGHT_RESULT_TOKEN_BUDGET", 1500)),
+    "search_hotels": int(os.getenv("HOTEL_RESULT_TOKEN_BUDGET", 1500)),
+    "tavily_search": int(os.getenv("TAVILY_RESULT_TOKEN_BUDGET", 1200)),
+}
+
+MAX_AMENITIES = 8
+MAX_NEARBY_PLACES = 3
+MAX_SNIPPET_CHARS = 600
+
+# Per-call savings go to a debug logger - results are projected on pool and prefetch
+# threads, and stdout belongs to the streamed answer. Totals are in travel_tool_result_tokens.
+_logger = logging.getLogger("travel_planner.projection")
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def compact_json(data) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def _drop_empty(data: dict) -> dict:
+    return {k: v for k, v in data.items() if v not in (None, "", [], {})}
+
+# --- Field projections --- #
+def project_flight(option: dict) -> dict:
+    """Keeps what the flight agent presents: price, airlines, times, duration, stops, layovers"""
+    legs = option.get("flights", [])
+    return _drop_empty({
+        "price": option.get("price"),
+        "type": option.get("type"),
+        "total_duration": option.get("total_duration"),
+        "stops": max(len(legs) - 1, 0),
+        "legs": [_drop_empty({
+            "airline": leg.get("airline"),
+            "flight_number": leg.get("flight_number"),
+            "from": leg.get("departure_airport", {}).get("id"),
+            "departs": leg.get("departure_airport", {}).get("time"),
+            "to": leg.get("arrival_airport", {}).get("id"),
+            "arrives": leg.get("arrival_airport", {}).get("time"),
+            "duration": leg.get("duration"),
+            "class": leg.get("travel_class"),
+            "overnight": leg.get("overnight"),
+        }) for leg in legs],
+        "layovers": [_drop_empty({
+            "airport": layover.get("id") or layover.get("name"),
+            "duration": layover.get("duration"),
+            "overnight": layover.get("overnight"),
+        }) for layover in option.get("layovers", [])],
+    })
+
+def project_hotel(prop: dict) -> dict:
+    """Keeps what the hotel agent presents: name, class, rates, rating, amenities, location"""
+    gps = prop.get("gps_coordinates") or {}
+    return _drop_empty({
+        "name": prop.get("name"),
+        "class": prop.get("extracted_hotel_class") or prop.get("hotel_class"),
+        "rate_per_night": (prop.get("rate_per_night") or {}).get("lowest"),
+        "total_rate": (prop.get("total_rate") or {}).get("lowest"),
+        "rating": prop.get("overall_rating"),
+        "reviews": prop.get("reviews"),
+        "location_rating": prop.get("location_rating"),
+        "amenities": (prop.get("amenities") or [])[:MAX_AMENITIES],
+        "nearby": [place.get("name") for place in (prop.get("nearby_places") or [])[:MAX_NEARBY_PLACES]],
+        "gps": [round(gps["latitude"], 4), round(gps["longitude"], 4)] if "latitude" in gps and "longitude" in gps else None,
+        "check_in": prop.get("check_in_time"),
+        "check_out": prop.get("check_out_time"),
+    })
+
+def project_web_result(result: dict) -> dict:
+    content = result.get("content") or ""
+    if len(content) > MAX_SNIPPET_CHARS:
+        content = content[:MAX_SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+    return _drop_empty({"title": result.get("title"), "url": result.get("url"), "content": content})
+
+# --- Budgeted serialization --- #
+def fit_to_budget(items: list, budget_tokens: int) -> str:
+    """Serializes items compactly, dropping the lowest-ranked ones until under budget (keeps at least one)"""
+    items = list(items)
+    text = compact_json(items)
+    while len(items) > 1 and estimate_tokens(text) > budget_tokens:
+        items.pop()
+        text = compact_json(items)
+    return text
+
+class ProjectionStats:
+    """Running totals of raw vs projected tool-result sizes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, tool_name: str, raw_tokens: int, projected_tokens: int):
+        with self._lock:
+            totals = self._totals.setdefault(tool_name, {"calls": 0, "raw_tokens": 0, "projected_tokens": 0})
+            totals["calls"] += 1
+            totals["raw_tokens"] += raw_tokens
+            totals["projected_tokens"] += projected_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {**totals, "reduction": 1 - totals["projected_tokens"] / totals["raw_tokens"] if totals["raw_tokens"] else 0.0}
+                for name, totals in self._totals.items()
+            }
+
+projection_stats = ProjectionStats()
+
+def _project(tool_name: str, raw, items: list) -> str:
+    text = fit_to_budget(items, TOKEN_BUDGETS[tool_name])
+    # Raw size is measured as the indented dump the agents used to receive
+    raw_tokens = estimate_tokens(json.dumps(raw, indent=2))
+    projected_tokens = estimate_tokens(text)
+    projection_stats.record(tool_name, raw_tokens, projected_tokens)
+    if raw_tokens:
+        _logger.debug("%s result: ~%d → ~%d tokens (%.0f%% smaller)",
+                      tool_name, raw_tokens, projected_tokens, 100 * (1 - projected_tokens / raw_tokens))
+    return text
+
+def project_flights(best_flights: list) -> str:
+    return _project("search_flights", best_flights, [project_flight(option) for option in best_flights])
+
+def project_hotels(properties: list) -> str:
+    return _project("search_hotels", properties, [project_hotel(prop) for prop in properties])
+
+def project_web_results(results: dict) -> str:
+    return _project("tavily_search", results, [project_web_result(result) for result in results.get("results", [])])
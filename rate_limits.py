@@ -0,0 +1,44 @@
+import os
+import time
+
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+# Requests per second allowed per provider - unset means unlimited. Each limiter is a
+# token bucket shared by every session, agent and batch worker in this process.
+PROVIDER_RPS = {
+    "gemini": os.getenv("GEMINI_RPS"),
+    "serpapi": os.getenv("SERPAPI_RPS"),
+    "tavily": os.getenv("TAVILY_RPS"),
+}
+# Seconds of quota a provider may burst through after an idle period
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", 1))
+
+def make_limiter(rps):
+    if not rps or float(rps) <= 0:
+        return None
+    rps = float(rps)
+    return InMemoryRateLimiter(
+        requests_per_second=rps,
+        check_every_n_seconds=min(0.1, 1 / rps),
+        max_bucket_size=max(1, rps * RATE_LIMIT_BURST_SECONDS),
+    )
+
+limiters = {provider: make_limiter(rps) for provider, rps in PROVIDER_RPS.items()}
+
+def acquire(provider: str, timeout: float = None) -> bool:
+    """Blocks until the provider's bucket has a token (no-op when unlimited)
+
+    With a timeout, gives up after that many seconds and returns False.
+    """
+    limiter = limiters.get(provider)
+    if limiter is None:
+        return True
+    if timeout is None:
+        return limiter.acquire()
+    give_up_at = time.monotonic() + timeout
+    while not limiter.acquire(blocking=False):
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(limiter.check_every_n_seconds, remaining))
+    return True
@@ -0,0 +1,327 @@
+"""Response cache for popular itinerary requests.
+
+"3 days in Paris", "Plan a 3-day trip to paris" and "paris 3 day itinerary" all
+ask for the same thing. The intent (destination, duration, month, themes) is
+extracted locally and used as the cache key, so a repeat request is answered
+without the Tavily search and two Gemini calls.
+
+Set ITINERARY_CACHE_SIMILARITY (e.g. 0.8) to also serve a near match: a request
+with the same destination, duration and month whose wording is close enough
+under a local hashed n-gram embedding. Requests carrying personal context
+(dietary needs, companions, budgets, exact dates), time-sensitive ones (weather,
+events), negations ("without museums") and several places always go to the
+agent. Other words the intent doesn't capture ("by train") become part of the key.
+"""
+import os
+import re
+import math
+import zlib
+import threading
+from collections import OrderedDict, Counter as TermCounter
+
+from langchain_core.messages import HumanMessage
+
+from cache import caches, make_key, normalize_text
+from metrics import record_cache_lookup, record_cache_bypass
+
+ITINERARY_CACHE_ENABLED = os.getenv("ITINERARY_CACHE", "1").lower() not in ("0", "false", "no")
+SIMILARITY_THRESHOLD = float(os.environ["ITINERARY_CACHE_SIMILARITY"]) if os.getenv("ITINERARY_CACHE_SIMILARITY") else None
+SIMILARITY_CANDIDATES = 32 # indexed requests kept per (destination, duration, month)
+
+# --- Intent extraction --- #
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+                "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "fourteen": 14}
+DURATION_PATTERN = re.compile(r"\b(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")[- ]?(day|night|week)s?\b")
+WEEKEND_PATTERN = re.compile(r"\b(long )?weekend\b")
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+THEMES = {
+    "food": r"food|foodies?|cuisine|culinary|restaurants?|street food|eat(?:ing)?",
+    "museums": r"museums?|galler(?:y|ies)|art",
+    "history": r"histor(?:y|ic|ical)|ruins|castles?|heritage",
+    "nightlife": r"nightlife|bars?|clubs?|clubbing|party",
+    "nature": r"nature|hik(?:e|es|ing)|trek(?:king)?|parks?|mountains?|outdoors?",
+    "beaches": r"beach(?:es)?|islands?|snorkel(?:l?ing)?|diving",
+    "shopping": r"shopping|markets?|boutiques?",
+    "family": r"family|kids|children",
+    "romance": r"romantic|honeymoon|couples?",
+    "budget": r"budget|cheap|affordable",
+    "luxury": r"luxury|luxurious|upscale",
+    "sightseeing": r"attractions|sightseeing|landmarks|must[- ]see|highlights",
+}
+THEME_PATTERNS = {theme: re.compile(rf"\b(?:{pattern})\b") for theme, pattern in THEMES.items()}
+
+# Wording that marks a request for a plan or a guide rather than a factual question
+PLAN_PATTERN = re.compile(r"\b(itinerar(?:y|ies)|plan|trip|things to do|what to do|what to see|guide|visit|getaway)\b")
+
+# The answer depends on who is asking - never share it between conversations
+PERSONAL_PATTERN = re.compile(
+    r"\b(?:allerg\w*|vegetarian|vegan|halal|kosher|gluten|wheelchair|mobility|disabilit\w*|pregnan\w*"
+    r"|my (?:wife|husband|partner|girlfriend|boyfriend|kids|son|daughter|parents|mom|dad|friends?|family|budget|hotel)"
+    r"|(?:i|we) (?:like|love|hate|prefer|dislike|don'?t like|already|have been|visited|am|are)"
+    r"|i'm|we're|staying at|arriv\w* (?:on|at))\b"
+    r"|[$€£]\s?\d|\b\d+\s?(?:usd|eur|gbp|dollars|euros|pounds)\b|\b\d{4}-\d{2}-\d{2}\b"
+)
+# Answers that go stale long before the cache TTL
+TIME_SENSITIVE_PATTERN = re.compile(
+    r"\b(weather|forecast|today|tonight|tomorrow|right now|currently|open now|this (?:week|weekend|month)"
+    r"|next (?:week|weekend)|events?|festivals?|concerts?|news|strikes?)\b"
+)
+
+# "without museums", "Italy not Rome" - the themes and destination alone would key the opposite request
+NEGATION_PATTERN = re.compile(r"\b(?:without|avoid\w*|not|no|except|excluding|skip\w*|don'?t|never|instead of)\b")
+# "Paris and Rome", "Paris, Lyon and Nice" - only the first place would be kept
+PLACE_JOINER_PATTERN = re.compile(r"\s*(?:,|&|\+|\band\b|\bor\b|\bthen\b|\bplus\b|\bvia\b)\s*(?:(?:then|also)\s+)?([a-z][a-z'.-]*)")
+
+DESTINATION_PREPOSITIONS = {"in", "to", "of", "around", "for", "visit", "visiting", "explore", "exploring", "through"}
+NOT_PLACES = {
+    "a", "an", "the", "my", "our", "me", "us", "you", "it", "there", "here", "do", "see", "go", "eat",
+    "stay", "spend", "plan", "trip", "itinerary", "holiday", "vacation", "travel", "day", "days", "week",
+    "weeks", "weekend", "night", "nights", "long", "first", "time", "two", "three", "four", "five", "city",
+    "best", "top", "things", "and", "with", "on", "at", "from", "during", "over", "next", "this", "in",
+    "for", "to", "by", "around", "where", "while", "near", "like", "as", "that", "which", "including",
+    *MONTHS, *NUMBER_WORDS,
+}
+MAX_DESTINATION_WORDS = 3
+CAPITALIZED_PLACE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(DESTINATION_PREPOSITIONS) + r") (?:the )?((?:[A-Z][\w'.-]*)(?: (?:[A-Z][\w'.-]*|de|del|la|le|of))*)", re.UNICODE
+)
+LEADING_PLACE_PATTERN = re.compile(r"([a-z][a-z'.-]*(?: [a-z][a-z'.-]*){0,2}) (?:\d{1,2}[- ]?days?|itinerary|trip|travel guide)\b")
+
+def _duration_days(text: str):
+    match = DURATION_PATTERN.search(text)
+    if match:
+        count = NUMBER_WORDS.get(match.group(1)) or int(match.group(1))
+        unit = match.group(2)
+        return count * 7 if unit == "week" else count + 1 if unit == "night" else count
+    match = WEEKEND_PATTERN.search(text)
+    if match:
+        return 3 if match.group(1) else 2
+    return None
+
+def _capitalized_destination(query: str):
+    """A capitalized name after a preposition - 'trip to Rome', '3 days in New York focused on food'"""
+    match = CAPITALIZED_PLACE_PATTERN.search(query)
+    if match and match.group(1).casefold() not in NOT_PLACES:
+        return match.group(1).casefold().strip(".'-")
+    return None
+
+def _destination(text: str):
+    """First place name after a preposition in lowercase text: 'trip to rome', 'things to do in new york'"""
+    tokens = re.findall(r"[a-z][a-z'.-]*|\d+|[?!,;:()]", text)
+    for i, token in enumerate(tokens):
+        if token not in DESTINATION_PREPOSITIONS:
+            continue
+        words = []
+        for word in tokens[i + 1:i + 1 + MAX_DESTINATION_WORDS]:
+            if (word in NOT_PLACES or not word[0].isalpha() or word.endswith(("ed", "ing"))
+                    or any(p.fullmatch(word) for p in THEME_PATTERNS.values())):
+                break
+            words.append(word.strip(".'-"))
+        if words:
+            return " ".join(words)
+    # "paris 3 day itinerary", "3-day paris trip" - the place comes right before the plan
+    for match in LEADING_PLACE_PATTERN.finditer(text):
+        words = match.group(1).split()
+        while words and words[0] in NOT_PLACES:
+            words.pop(0)
+        if words and not set(words) & NOT_PLACES:
+            return " ".join(words)
+    return None
+
+def extract_intent(query: str):
+    """The cacheable intent of an itinerary request, or None when the query isn't a plain plan/guide request"""
+    text = normalize_text(query)
+    destination = _capitalized_destination(" ".join(query.split())) or _destination(text)
+    if destination is None:
+        return None
+    days = _duration_days(text)
+    themes = sorted(theme for theme, pattern in THEME_PATTERNS.items() if pattern.search(text))
+    if days is None and not themes and not PLAN_PATTERN.search(text):
+        return None # "visa rules for Japan" - not an itinerary request
+    month = next((m for m in MONTHS if re.search(rf"\b{m}\b", text)), None)
+    return {"destination": destination, "days": days, "month": month, "themes": themes}
+
+# --- Local similarity index --- #
+# Words that carry no preference - the destination and duration already match within a group
+FILLER_WORDS = NOT_PLACES | {
+    "what", "should", "can", "could", "would", "i", "we", "is", "are", "be", "some", "give", "make", "need",
+    "want", "suggest", "please", "recommend", "focused", "focus", "lots", "of", "good", "great", "ideas",
+}
+
+# Words that never change the answer - anything else left after intent extraction
+# (party, transport, pace: "with a toddler", "by train", "on a shoestring") joins the key
+INTENT_WORDS = FILLER_WORDS | {
+    "how", "spend", "guide", "visit", "visiting", "explore", "exploring", "getaway", "itinerary", "itineraries",
+    "tips", "suggestions", "create", "build", "show", "tell", "help", "places", "place", "nice", "perfect",
+    "ideal", "sample", "typical", "classic", "must", "see", "street", "trips", "holidays", "vacations", "one",
+    "days", "nights", "weeks", "get", "know", "let's", "let", "up", "put", "together", "try",
+}
+
+def _more_places(text: str, destination: str) -> bool:
+    """True when another place is joined to the destination - 'paris and rome', 'paris, lyon and nice'"""
+    start = text.find(destination)
+    if start < 0:
+        return False
+    match = PLACE_JOINER_PATTERN.match(text, start + len(destination))
+    if not match:
+        return False
+    word = match.group(1)
+    return word not in INTENT_WORDS and word not in MONTHS and not any(p.fullmatch(word) for p in THEME_PATTERNS.values())
+
+def leftover_words(text: str, destination: str, month: str = None) -> list:
+    """Sorted words of the request not covered by the intent fields or INTENT_WORDS"""
+    for pattern in (*THEME_PATTERNS.values(), DURATION_PATTERN, WEEKEND_PATTERN, PLAN_PATTERN):
+        text = pattern.sub(" ", text)
+    # A second month ("in may and june") is a different request
+    skip = (INTENT_WORDS - set(MONTHS)) | set(destination.split()) | {month}
+    return sorted({word for word in re.findall(r"[a-z][a-z']*", text) if word not in skip})
+
+def embed(text: str, ignore: str = "") -> dict:
+    """Sparse, L2-normalised hashed bag of words and character trigrams - cheap and stable across restarts
+
+    Filler words and the words of `ignore` (the destination) are dropped, so the
+    vector describes what the traveller wants rather than how they phrased it.
+    """
+    skip = FILLER_WORDS | set(ignore.split())
+    words = [word for word in re.findall(r"[a-z]+", normalize_text(text)) if word not in skip]
+    features = TermCounter(words)
+    for word in words:
+        padded = f" {word} "
+        features.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    vector = {}
+    for feature, count in features.items():
+        slot = zlib.crc32(feature.encode()) & 0xFFFFF
+        vector[slot] = vector.get(slot, 0.0) + count
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0 # All filler words - an empty vector matches nothing
+    return {slot: value / norm for slot, value in vector.items()}
+
+def cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(slot, 0.0) for slot, value in a.items())
+
+class SimilarityIndex:
+    """Embeddings of cached requests, grouped by the intent fields that must match exactly"""
+
+    def __init__(self, per_group: int = SIMILARITY_CANDIDATES):
+        self.per_group = per_group
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def add(self, group: str, key: str, vector: dict):
+        with self._lock:
+            entries = self._groups.setdefault(group, OrderedDict())
+            entries[key] = vector
+            entries.move_to_end(key)
+            while len(entries) > self.per_group:
+                entries.popitem(last=False)
+
+    def nearest(self, group: str, vector: dict):
+        """(key, score) of the closest indexed request in the group, or (None, 0.0)"""
+        with self._lock:
+            entries = list(self._groups.get(group, {}).items())
+        best_key, best_score = None, 0.0
+        for key, candidate in entries:
+            score = cosine(vector, candidate)
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key, best_score
+
+    def discard(self, group: str, key: str):
+        with self._lock:
+            self._groups.get(group, {}).pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+
+similarity_index = SimilarityIndex()
+
+# --- Cache front for the itinerary agent --- #
+def _user_texts(state) -> list:
+    texts = [message.content for message in state["messages"]
+             if isinstance(message, HumanMessage) and isinstance(message.content, str)]
+    if state.get("summary"):
+        texts.append(state["summary"])
+    return texts
+
+def _cache_request(state, single_agent: bool = False):
+    """(request, bypass_reason) - exactly one of them is None"""
+    if not single_agent and len(state.get("next_agents") or []) > 1:
+        return None, "fan_out"
+    query = state["messages"][-1].content
+    if not isinstance(query, str):
+        return None, "no_intent"
+    if any(PERSONAL_PATTERN.search(normalize_text(text)) for text in _user_texts(state)):
+        return None, "personal"
+    if TIME_SENSITIVE_PATTERN.search(normalize_text(query)):
+        return None, "time_sensitive"
+    text = normalize_text(query)
+    if NEGATION_PATTERN.search(text):
+        return None, "negation"
+    intent = extract_intent(query)
+    if intent is None:
+        return None, "no_intent"
+    if _more_places(text, intent["destination"]):
+        return None, "several_places"
+    # Anything the intent fields don't capture keys the answer too, so "with a toddler" or
+    # "by train" never receives the plain request's answer
+    intent["extra"] = leftover_words(text, intent["destination"], intent["month"])
+    group = make_key("itinerary", {field: intent[field] for field in ("destination", "days", "month", "extra")})
+    return {"key": make_key("itinerary", intent), "group": group, "query": query, "destination": intent["destination"]}, None
+
+def cache_request(state):
+    """The cache request for this turn - None when the turn must bypass the cache
+
+    Returns {"key", "group", "query", "destination"}. Bypass reasons are counted in
+    travel_response_cache_bypasses_total.
+    """
+    if not ITINERARY_CACHE_ENABLED:
+        return None
+    request, reason = _cache_request(state)
+    if reason is not None:
+        record_cache_bypass("itineraries", reason)
+    return request
+
+def would_hit(state) -> bool:
+    """True when the itinerary agent would answer this turn from the cache
+
+    The router asks before speculating on the itinerary agent, so a turn the cache
+    answers doesn't pay for a planning LLM call that is thrown away. Records no
+    metrics - the agent's own lookup does that.
+    """
+    if not ITINERARY_CACHE_ENABLED:
+        return False
+    request, _ = _cache_request(state, single_agent=True)
+    if request is None:
+        return False
+    cache = caches["itineraries"]
+    if cache.contains(request["key"]):
+        return True
+    if SIMILARITY_THRESHOLD is None:
+        return False
+    key, score = similarity_index.nearest(request["group"], embed(request["query"], request["destination"]))
+    return key is not None and score >= SIMILARITY_THRESHOLD and cache.contains(key)
+
+def lookup(request: dict):
+    """The cached answer for a request, or None"""
+    cache = caches["itineraries"]
+    hit, answer = cache.get(request["key"])
+    if not hit and SIMILARITY_THRESHOLD is not None:
+        key, score = similarity_index.nearest(request["group"], embed(request["query"], request["destination"]))
+        if key is not None and score >= SIMILARITY_THRESHOLD:
+            hit, answer = cache.get(key)
+            if hit:
+                print(f"⚡ Similar itinerary request (similarity {score:.2f})")
+            else:
+                similarity_index.discard(request["group"], key) # Expired or evicted
+    record_cache_lookup("itineraries", hit)
+    return answer if hit else None
+
+def store(request: dict, answer: str):
+    caches["itineraries"].set(request["key"], answer)
+    if SIMILARITY_THRESHOLD is not None:
+        similarity_index.add(request["group"], request["key"], embed(request["query"], request["destination"]))
@@ -0,0 +1,62 @@
+"""Labeled set for the itinerary response cache - checks which requests may share an answer.
+
+Run with: python response_cache_eval.py    (exits 1 when a case fails; no API key needed)
+
+SAME_ANSWER groups must map to one cache key. DIFFERENT_ANSWER pairs must not
+share a key - a later request may bypass the cache or get its own key, but must
+never be served the earlier request's answer.
+"""
+import sys
+
+from langchain_core.messages import HumanMessage
+
+from response_cache import _cache_request
+
+SAME_ANSWER = [
+    ["3 days in Paris", "Plan a 3-day trip to paris", "paris 3 day itinerary", "What should I do in Paris for 3 days?"],
+    ["Plan a 3-day trip to Paris focused on museums", "3 days in Paris with lots of museums", "Give me a 3 days plan for Paris with museums"],
+    ["Plan a 7-day trip to Italy.", "Plan a 7 day trip to Italy"],
+    ["A long weekend in Lisbon in May", "Plan a long weekend in Lisbon in May"],
+]
+
+DIFFERENT_ANSWER = [
+    # Several places - only the first one would be keyed
+    ("Plan a trip to Paris", "Plan a trip to Paris and Rome"),
+    ("Plan a trip to Paris", "Plan a trip to Paris, Lyon and Nice"),
+    # Negations - the themes alone would key the opposite request
+    ("3 days in Paris with lots of museums", "3 days in Paris without museums"),
+    ("Plan a 3-day trip to Paris focused on museums", "Plan a 3-day trip to Paris avoiding museums"),
+    ("Plan a 5 day trip to Italy", "Plan a 5 day trip to Italy not Rome"),
+    # Qualifiers the intent fields don't capture
+    ("Things to do in Paris", "Things to do in Paris with a toddler"),
+    ("Things to do in Paris", "Things to do in Paris by train"),
+    ("Things to do in Paris", "Things to do in Paris on a shoestring"),
+    ("Plan a trip to Paris in May", "Plan a trip to Paris in May and June"),
+]
+
+def cache_key(query: str):
+    request, reason = _cache_request({"messages": [HumanMessage(content=query)]})
+    return request["key"] if request else f"bypass:{reason}"
+
+def main():
+    failures = []
+    for group in SAME_ANSWER:
+        keys = {query: cache_key(query) for query in group}
+        if len(set(keys.values())) != 1 or any(key.startswith("bypass:") for key in keys.values()):
+            failures.append(f"expected one key for {group}: {sorted(set(keys.values()))}")
+    for first, second in DIFFERENT_ANSWER:
+        key = cache_key(second)
+        if not key.startswith("bypass:") and key == cache_key(first):
+            failures.append(f"{second!r} would be served the answer to {first!r}")
+
+    total = len(SAME_ANSWER) + len(DIFFERENT_ANSWER)
+    print("\n🗂️ Response cache evaluation")
+    print("=" * 50)
+    print(f"Passed: {total - len(failures)}/{total}")
+    for failure in failures:
+        print(f"  ❌ {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,428 @@
-from langchain_core.output_parsers import StrOutputParser
+import re
+import time
+
 from langchain_core.prompts import ChatPromptTemplate
 
-from llm_config import llm
 from state import TravelPlannerState
+from events import emit_event
+from metrics import instrument_node, record_route, timed_llm
+from speculation import SPECULATIVE_ROUTING, Speculation
+import response_cache
 
-def create_router():
-    """Creates a router for the three travel agents using LangGraph patterns"""
+# Map router labels to our agent node names
+AGENT_MAPPING = {
+    "FLIGHT": "flight_agent",
+    "HOTEL": "hotel_agent",
+    "ITINERARY": "itenary_agent"
+}
 
-    router_prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a routing expert for a travel planning system.\n\n        Analyze the user's query and decide which specialist agent should handle it:\n\n        - FLIGHT: Flight bookings, airlines, air travel, flight search, tickets, airports, departures, arrivals, airline prices\n        - HOTEL: Hotels, accommodations, stays, rooms, hotel bookings, lodging, resorts, hotel search, hotel prices\n        - ITINERARY: Travel itineraries, trip planning, destinations, activities, attractions, sightseeing, travel advice, weather, culture, food, general travel questions\n\n        Respond with ONLY one word: FLIGHT, HOTEL, or ITINERARY\n\n        Examples:\n        "Book me a flight to Paris" → FLIGHT\n        "Find hotels in Tokyo" → HOTEL\n        "Plan my 5-day trip to Italy" → ITINERARY\n        "Search flights from NYC to London" → FLIGHT\n        "Where should I stay in Bali?" → HOTEL\n        "What are the best attractions in Rome?" → ITINERARY\n        "I need airline tickets" → FLIGHT\n        "Show me hotel options" → HOTEL\n        "Create an itinerary for Japan" → ITINERARY"""),
+# --- Local keyword classifier --- #
+# Weighted patterns scored against the lower-cased query. Built from the examples
+# in the router prompt plus the phrasing we see most often in real traffic.
+KEYWORD_PATTERNS = {
+    "FLIGHT": [
+        (r"\bflights?\b", 3),
+        (r"\bfly(ing)?\b|\bflew\b", 2),
+        (r"\bairlines?\b|\bairways\b", 3),
+        (r"\bairports?\b", 2),
+        (r"\b(air|plane|airline) tickets?\b", 3),
+        (r"\btickets?\b", 1),
+        (r"\bround[- ]trip\b|\bone[- ]way\b|\blayovers?\b|\bnon[- ]?stop\b", 2),
+        (r"\bdepartures?\b|\barrivals?\b|\bboarding\b", 1),
+        (r"\b(economy|business class|first class)\b", 1),
+    ],
+    "HOTEL": [
+        (r"\bhotels?\b", 3),
+        (r"\baccommodations?\b|\blodging\b", 3),
+        (r"\bresorts?\b|\bhostels?\b|\bmotels?\b|\bairbnbs?\b|\binns?\b", 2),
+        (r"\bwhere (should|can|do) (i|we) stay\b|\bplace to stay\b", 3),
+        (r"\bstay(ing|s)?\b", 1),
+        (r"\brooms?\b|\bsuites?\b", 1),
+        (r"\bcheck[- ]?in\b|\bcheck[- ]?out\b|\bnights?\b", 1),
+        (r"\b\d[- ]star\b", 1),
+    ],
+    "ITINERARY": [
+        (r"\bitinerar(y|ies)\b", 3),
+        (r"\bplan(ning)?\b", 2),
+        (r"\btrip\b|\bvacation\b|\bholiday\b|\bgetaway\b", 1),
+        (r"\battractions?\b|\bsightseeing\b|\bthings to do\b|\bmust[- ]see\b", 3),
+        (r"\bactivit(y|ies)\b|\btours?\b|\bmuseums?\b|\blandmarks?\b", 2),
+        (r"\bweather\b|\bculture\b|\bfood\b|\bcuisine\b|\brestaurants?\b", 2),
+        (r"\bvisit(ing)?\b|\bexplore\b|\bdestinations?\b|\btravel (tips|advice)\b", 1),
+        (r"\b\d+[- ]days?\b", 1),
+    ],
+}
 
-        ("user", "Query: {query}")
-    ])
+# Airport-code pairs such as "JFK to LHR" are a strong flight signal (case-sensitive)
+AIRPORT_PAIR_PATTERN = re.compile(r"\b[A-Z]{3}\s*(?:to|-|→|->)\s*[A-Z]{3}\b")
 
-    router_chain = router_prompt | llm | StrOutputParser()
-    def route_query(state: TravelPlannerState):
-        """Router function for LangGraph - decides which agent to call next"""
+COMPILED_PATTERNS = {
+    label: [(re.compile(pattern), weight) for pattern, weight in patterns]
+    for label, patterns in KEYWORD_PATTERNS.items()
+}
 
-        # Get the latest user message
-        user_message = state["messages"][-1].content
+# Minimum confidence (share of the total score held by the top label) for the
+# local decision to be trusted without asking the LLM
+LOCAL_CONFIDENCE_THRESHOLD = 0.6
+LOCAL_MIN_SCORE = 2
 
-        print(f"🧭 Router analyzing: '{user_message[:50]}...'\n")
+# --- Explicit requests (multi-intent fan-out) --- #
+# Keywords alone over-trigger a fan-out ("hotels near the top attractions" is one
+# request), so a query only fans out when each intent is actually asked for:
+# a request verb with its object, a standalone action ("fly to", "stay in a hotel"),
+# or an object that continues such a request ("find flights to Rome and a hotel").
+ACTION_OBJECTS = {
+    "FLIGHT": r"flights?|(?:plane|air|airline) tickets?|airfares?",
+    "HOTEL": r"hotels?|rooms?|accommodations?|lodging|hostels?|resorts?|motels?|airbnbs?|b&bs?|(?:a )?place to stay|somewhere to stay",
+    "ITINERARY": r"itinerar(?:y|ies)|day[- ]by[- ]day(?: plan)?|sightseeing|things to do|(?:\d+|one|two|three|four|five|six|seven|ten)[- ]days? (?:plan|trip|itinerary|tour)",
+}
+ACTION_OBJECT_GROUPS = "(?:" + "|".join(f"(?P<{label}>{objects})" for label, objects in ACTION_OBJECTS.items()) + r")\b"
+REQUEST_VERB_PATTERN = re.compile(
+    r"\b(?:book(?:ing)?|find|search(?:ing)?(?: for)?|look(?:ing)? for|get|show(?: me)?|need|want|compare|check|"
+    r"reserve|recommend|suggest|give me|plan|create|make|build|draft|put together|arrange|sort out)\b"
+)
+# "don't need flights", "no need to book a hotel" - the verb is not a request
+NEGATED_VERB_PATTERN = re.compile(r"(?:\bdon'?t|\bdo not|\bnot|\bno need to|\bnever)\s+$")
+# The verb's object is the first action object within the next three words - punctuation ends the search
+OBJECT_AFTER_VERB_PATTERN = re.compile(r"(?:\s+[\w'&-]+){0,3}?\s+" + ACTION_OBJECT_GROUPS)
+# A further object continuing the same request: "flights to Rome, a hotel near the Colosseum and a 3-day plan"
+CONTINUED_OBJECT_PATTERN = re.compile(
+    r"(?P<lead>(?:\s+[\w'&→>-]+){0,4}?\s*(?:,|\band\b|\bplus\b|&)\s+(?:[\w'-]+\s+){0,2}?)" + ACTION_OBJECT_GROUPS
+)
+# Objects the traveller already has or rules out are not requests: "I already have flights", "no hotel"
+NOT_REQUESTED_LEAD_PATTERN = re.compile(r"\b(?:have|had|got|already|booked|no|not|without|don'?t|except)\b")
+NOT_REQUESTED_TAIL_PATTERN = re.compile(
+    r"\s*(?:(?:are|is|was|were|'re|'s)\s+)?(?:already\b|booked\b|fixed\b|sorted\b|covered\b|paid\b|done\b|taken care"
+    r"|too (?:expensive|pricey|much)|not needed\b)"
+)
+STANDALONE_ACTION_PATTERNS = {
+    "FLIGHT": re.compile(r"\bfly(?:ing)? (?:to|from|into|out of|back|home)\b|\bflights? (?:to|from|between)\b|\bflights? [a-z]+ ?(?:→|->) ?[a-z]+"),
+    "HOTEL": re.compile(
+        r"\bstay(?:ing)? (?:in|at) (?:(?:a|an|the)\s+)?(?:[\w'-]+\s+)?(?:hotel|hostel|resort|motel|airbnb|b&b)s?\b"
+        r"|\bwhere (?:should|can|could|do) (?:i|we) stay\b"
+    ),
+    "ITINERARY": re.compile(r"\b(?:\d+|one|two|three|four|five|six|seven|ten)[- ]days? (?:itinerary|plan)\b|\bwhat to (?:see|do)\b"),
+}
 
-        try:
-            # Get LLM routing decision
-            decision = router_chain.invoke({"query": user_message}).strip().upper()
+def score_query(query: str) -> dict:
+    """Scores a query against the keyword patterns of every route label"""
+    text = query.lower()
+    scores = {
+        label: sum(weight for pattern, weight in patterns if pattern.search(text))
+        for label, patterns in COMPILED_PATTERNS.items()
+    }
+    if AIRPORT_PAIR_PATTERN.search(query):
+        scores["FLIGHT"] += 3
+    return scores
 
-            # Map to our agent node names
-            agent_mapping = {
-                "FLIGHT": "flight_agent",
-                "HOTEL": "hotel_agent",
-                "ITINERARY": "itenary_agent"
-            }
+def classify_locally(query: str):
+    """Returns (label, confidence) from the keyword scorer, label is None when nothing matched
 
-            next_agent = agent_mapping.get(decision, "itenary_agent")
-            print(f"🎯 Router decision: {decision} → {next_agent}")
+    A query with exactly one explicit request (see requested_labels) goes to it with
+    full confidence - "find a hotel, flights are booked" is a hotel query whatever
+    the keyword counts say.
+    """
+    requested = requested_labels(query)
+    if len(requested) == 1:
+        return next(iter(requested)), 1.0
+    scores = score_query(query)
+    total = sum(scores.values())
+    if total == 0:
+        return None, 0.0
 
-            return next_agent
+    label = max(scores, key=scores.get)
+    if scores[label] < LOCAL_MIN_SCORE:
+        return label, 0.0
+    return label, scores[label] / total
 
-        except Exception as e:
-            print(f"⚠️ Router error, defaulting to itenary_agent: {e}")
-            return "itenary_agent"
+def _continued_requests(text: str, position: int) -> set:
+    """Labels of the objects chained onto the request that ends at position"""
+    labels = set()
+    while True:
+        match = CONTINUED_OBJECT_PATTERN.match(text, position)
+        if not match or NOT_REQUESTED_LEAD_PATTERN.search(match.group("lead")) \
+                or NOT_REQUESTED_TAIL_PATTERN.match(text, match.end()):
+            return labels
+        labels.add(match.lastgroup)
+        position = match.end()
 
-    return route_query
+def requested_labels(query: str) -> set:
+    """Route labels the query explicitly asks for - see ACTION_OBJECTS"""
+    text = query.lower()
+    requests = [] # (label, end of the request)
+    for verb in REQUEST_VERB_PATTERN.finditer(text):
+        if NEGATED_VERB_PATTERN.search(text, 0, verb.start()):
+            continue
+        match = OBJECT_AFTER_VERB_PATTERN.match(text, verb.end())
+        if match and not NOT_REQUESTED_TAIL_PATTERN.match(text, match.end()):
+            requests.append((match.lastgroup, match.end()))
+    for label, pattern in STANDALONE_ACTION_PATTERNS.items():
+        requests.extend((label, match.end()) for match in pattern.finditer(text))
+    requests.extend(("FLIGHT", match.end()) for match in AIRPORT_PAIR_PATTERN.finditer(query))
 
-def router_node(state: TravelPlannerState):
-    """Router node - determines which agent should handle the query"""
-    # Assuming create_router is called once globally or passed in
-    # For simplicity, we'll create it here each time, or ensure it's a global call in main
-    router_func = create_router() 
-    next_agent = router_func(state)
+    labels = {label for label, _ in requests}
+    for _, end in requests:
+        labels |= _continued_requests(text, end)
+    return labels
+
+def detect_intents(query: str) -> list:
+    """Returns the agents the query explicitly asks for, in AGENT_MAPPING order"""
+    labels = requested_labels(query)
+    return [agent for label, agent in AGENT_MAPPING.items() if label in labels]
+
+# --- LLM router chain (built once, on first low-confidence query) --- #
+_router_chain = None
+
+def get_router_chain():
+    """Returns the shared LLM routing chain, building it on first use"""
+    global _router_chain
+    if _router_chain is None:
+        from llm_config import llm
+
+        router_prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are a routing expert for a travel planning system.\n\n        Analyze the user's query and decide which specialist agent should handle it:\n\n        - FLIGHT: Flight bookings, airlines, air travel, flight search, tickets, airports, departures, arrivals, airline prices\n        - HOTEL: Hotels, accommodations, stays, rooms, hotel bookings, lodging, resorts, hotel search, hotel prices\n        - ITINERARY: Travel itineraries, trip planning, destinations, activities, attractions, sightseeing, travel advice, weather, culture, food, general travel questions\n\n        Respond with ONLY the label: FLIGHT, HOTEL, or ITINERARY\n        If the query explicitly asks for more than one of these services, respond with every requested label separated by commas, e.g. FLIGHT, HOTEL\n        Mentioning a topic is not asking for it - a hotel near attractions is still only HOTEL\n\n        Examples:\n        "Book me a flight to Paris" → FLIGHT\n        "Find hotels in Tokyo" → HOTEL\n        "Plan my 5-day trip to Italy" → ITINERARY\n        "Search flights from NYC to London" → FLIGHT\n        "Where should I stay in Bali?" → HOTEL\n        "What are the best attractions in Rome?" → ITINERARY\n        "I need airline tickets" → FLIGHT\n        "Show me hotel options" → HOTEL\n        "Create an itinerary for Japan" → ITINERARY\n        "Find hotels near the top attractions in Rome" → HOTEL\n        "Plan my trip: book a hotel in Rome" → HOTEL\n        "Get me to Lisbon next Friday and somewhere central to sleep" → FLIGHT, HOTEL"""),
+
+            ("user", "Query: {query}")
+        ])
+
+        # No output parser - the AIMessage carries the usage metadata we record
+        _router_chain = router_prompt | llm
+    return _router_chain
+
+ROUTE_LABEL_PATTERN = re.compile(r"\b(FLIGHT|HOTEL|ITINERARY)\b")
+
+def parse_route(content: str) -> list:
+    """Agents named in an LLM routing answer, in AGENT_MAPPING order - the itinerary agent when none is"""
+    labels = set(ROUTE_LABEL_PATTERN.findall(content.upper()))
+    return [agent for label, agent in AGENT_MAPPING.items() if label in labels] or ["itenary_agent"]
+
+# --- Batched LLM routing --- #
+# Labels for low-confidence queries routed ahead of time with one batched LLM call
+_primed_routes = {}
+
+def needs_llm_route(query: str) -> bool:
+    """True when neither the multi-intent check nor the local classifier can route the query"""
+    if len(detect_intents(query)) > 1:
+        return False
+    label, confidence = classify_locally(query)
+    return not (label and confidence >= LOCAL_CONFIDENCE_THRESHOLD)
+
+async def aprime_routes(queries, max_concurrency: int = 8) -> int:
+    """Routes every low-confidence query of a batch with llm.abatch - returns how many were primed
+
+    route_query/aroute_query reuse these labels instead of calling the LLM once per query.
+    Failed items are left out and routed normally later.
+    """
+    pending = [query for query in dict.fromkeys(queries) if query not in _primed_routes and needs_llm_route(query)]
+    if not pending:
+        return 0
+    with timed_llm("router.batch"):
+        responses = await get_router_chain().abatch(
+            [{"query": query} for query in pending], {"max_concurrency": max_concurrency}, return_exceptions=True
+        )
+    for query, response in zip(pending, responses):
+        if not isinstance(response, Exception):
+            _primed_routes[query] = response.content.strip().upper()
+    return sum(not isinstance(response, Exception) for response in responses)
+
+def clear_primed_routes():
+    _primed_routes.clear()
+
+def _primed_route(user_message: str):
+    decision = _primed_routes.get(user_message)
+    if decision is None:
+        return None
+    next_agents = parse_route(decision)
+    print(f"🎯 Router decision (llm, batched): {decision} → {' + '.join(next_agents)}")
+    return next_agents
+
+def _route_without_llm_call(user_message: str, use_llm: bool):
+    """(next_agents, route_source) when no LLM call is needed, otherwise None"""
+    print(f"🧭 Router analyzing: '{user_message[:50]}...'\n")
+
+    label, confidence = classify_locally(user_message)
+    if label and confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+        next_agent = AGENT_MAPPING[label]
+        print(f"🎯 Router decision (local, {confidence:.2f}): {label} → {next_agent}")
+        return [next_agent], "local"
+
+    if not use_llm:
+        next_agent = AGENT_MAPPING.get(label, "itenary_agent")
+        print(f"🎯 Router decision (local guess, {confidence:.2f}): {label} → {next_agent}")
+        return [next_agent], "local_guess"
+
+    next_agents = _primed_route(user_message)
+    if next_agents:
+        return next_agents, "llm"
+    return None
+
+def _llm_route(message):
+    """(next_agents, route_source) from the router LLM's answer"""
+    decision = message.content.strip().upper()
+    next_agents = parse_route(decision)
+    print(f"🎯 Router decision (llm): {decision} → {' + '.join(next_agents)}")
+    return next_agents, "llm"
+
+def _fallback_route(error: Exception):
+    print(f"⚠️ Router error, defaulting to itenary_agent: {error}")
+    return ["itenary_agent"], "fallback"
+
+def route_query(state: TravelPlannerState, use_llm: bool = True):
+    """Router function for LangGraph - returns (next_agents, route_source)
+
+    next_agents holds one agent, or several when the LLM finds more than one request.
+    route_source is "local" when the keyword classifier was confident enough,
+    "llm" when Gemini made the call and "fallback" when routing failed.
+    With use_llm=False low-confidence queries keep the best local guess ("local_guess").
+    """
+    # Get the latest user message
+    user_message = state["messages"][-1].content
+    routed = _route_without_llm_call(user_message, use_llm)
+    if routed:
+        return routed
+
+    try:
+        # Get LLM routing decision
+        with timed_llm("router") as call:
+            call.message = get_router_chain().invoke({"query": user_message})
+        return _llm_route(call.message)
+    except Exception as e:
+        return _fallback_route(e)
+
+async def aroute_query(state: TravelPlannerState, use_llm: bool = True):
+    """Async version of route_query - only the low-confidence LLM path awaits"""
+    user_message = state["messages"][-1].content
+    routed = _route_without_llm_call(user_message, use_llm)
+    if routed:
+        return routed
+
+    try:
+        with timed_llm("router") as call:
+            call.message = await get_router_chain().ainvoke({"query": user_message})
+        return _llm_route(call.message)
+    except Exception as e:
+        return _fallback_route(e)
+
+def create_router():
+    """Creates a router for the three travel agents using LangGraph patterns"""
+    get_router_chain()
+
+    def router_func(state: TravelPlannerState):
+        next_agents, _ = route_query(state)
+        return next_agents[0]
+
+    return router_func
+
+def multi_intent_agents(state: TravelPlannerState) -> list:
+    """Returns the agents to fan out to, or an empty list for a single-intent query"""
+    user_message = state["messages"][-1].content
+    agents = detect_intents(user_message)
+    if len(agents) < 2:
+        return []
+    print(f"🎯 Router decision (local, multi-intent): {' + '.join(agents)}")
+    return agents
+
+def _routing_update(state: TravelPlannerState, next_agents: list, route_source: str, speculation: dict = None) -> dict:
+    emit_event("route", next_agent=next_agents[0], next_agents=next_agents, route_source=route_source)
+    for next_agent in next_agents:
+        record_route(next_agent, route_source)
 
     return {
-        "next_agent": next_agent,
+        "next_agent": next_agents[0],
+        "next_agents": next_agents,
+        "route_source": route_source,
+        "agent_answers": None, # Start the turn with no branch answers
+        "speculation": speculation,
         "user_query": state["messages"][-1].content # User query is already in messages, but explicit for clarity
-    }
\ No newline at end of file
+    }
+
+# --- Speculative routing --- #
+def predict_agent(state: TravelPlannerState):
+    """Most likely agent for a query the LLM must route - the session's previous agent, else the local guess"""
+    if len(state["messages"]) > 1 and state.get("next_agent"):
+        return state["next_agent"]
+    label, _ = classify_locally(state["messages"][-1].content)
+    return AGENT_MAPPING.get(label)
+
+def speculation_target(state: TravelPlannerState):
+    """The agent worth starting before routing finishes, or None when routing won't call the LLM"""
+    if not SPECULATIVE_ROUTING:
+        return None
+    user_message = state["messages"][-1].content
+    if user_message in _primed_routes or not needs_llm_route(user_message):
+        return None
+    target = predict_agent(state)
+    if target == AGENT_MAPPING["ITINERARY"] and response_cache.would_hit(state):
+        return None # The cached answer needs no planning call
+    return target
+
+def _single_agent(next_agents: list):
+    return next_agents[0] if len(next_agents) == 1 else None
+
+@instrument_node("router")
+def router_node(state: TravelPlannerState):
+    """Router node - determines which agent (or agents, for a multi-intent query) should handle the query"""
+    next_agents = multi_intent_agents(state)
+    if next_agents:
+        return _routing_update(state, next_agents, "local_multi")
+
+    target = speculation_target(state)
+    speculation = Speculation.start(target, state) if target else None
+
+    start = time.perf_counter()
+    next_agents, route_source = route_query(state)
+    router_duration = time.perf_counter() - start
+
+    # A fan-out runs every agent as a branch, so a speculated first step only fits a single route
+    speculated = speculation.resolve(_single_agent(next_agents), router_duration) if speculation else None
+    return _routing_update(state, next_agents, route_source, speculated)
+
+@instrument_node("router")
+async def arouter_node(state: TravelPlannerState):
+    """Router node (async)"""
+    next_agents = multi_intent_agents(state)
+    if next_agents:
+        return _routing_update(state, next_agents, "local_multi")
+
+    target = speculation_target(state)
+    speculation = Speculation.astart(target, state) if target else None
+
+    start = time.perf_counter()
+    next_agents, route_source = await aroute_query(state)
+    router_duration = time.perf_counter() - start
+
+    speculated = await speculation.aresolve(_single_agent(next_agents), router_duration) if speculation else None
+    return _routing_update(state, next_agents, route_source, speculated)
+
+# --- Router evaluation --- #
+def evaluate_router(examples, use_llm: bool = False):
+    """Measures routing accuracy and latency over (query, expected) pairs
+
+    expected is a route label, or a tuple of labels for a query that should fan out.
+    Queries go through the same decision as router_node - multi-intent check first.
+    """
+    from langchain_core.messages import HumanMessage
+
+    results = {"correct": 0, "total": 0, "paths": {}, "errors": []}
+    for query, expected in examples:
+        expected_labels = (expected,) if isinstance(expected, str) else tuple(expected)
+        expected_agents = [agent for label, agent in AGENT_MAPPING.items() if label in expected_labels]
+        start = time.perf_counter()
+        next_agents, source = detect_intents(query), "local_multi"
+        if len(next_agents) < 2:
+            next_agents, source = route_query({"messages": [HumanMessage(content=query)]}, use_llm=use_llm)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        path = results["paths"].setdefault(source, {"count": 0, "correct": 0, "latency_ms": []})
+        path["count"] += 1
+        path["latency_ms"].append(elapsed_ms)
+
+        results["total"] += 1
+        if next_agents == expected_agents:
+            results["correct"] += 1
+            path["correct"] += 1
+        else:
+            results["errors"].append((query, expected, " + ".join(next_agents), source))
+
+    results["accuracy"] = results["correct"] / results["total"] if results["total"] else 0.0
+    return results
@@ -0,0 +1,82 @@
+"""Labeled routing set - measures router accuracy and latency per decision path.
+
+A tuple of labels marks a query that should fan out to several agents.
+
+Run with: python router_eval.py [--llm]
+Without --llm only the local classifier is exercised (no API key needed).
+"""
+import sys
+import statistics
+
+from router import evaluate_router
+
+ROUTER_EVAL_SET = [
+    # Examples from the router prompt
+    ("Book me a flight to Paris", "FLIGHT"),
+    ("Find hotels in Tokyo", "HOTEL"),
+    ("Plan my 5-day trip to Italy", "ITINERARY"),
+    ("Search flights from NYC to London", "FLIGHT"),
+    ("Where should I stay in Bali?", "HOTEL"),
+    ("What are the best attractions in Rome?", "ITINERARY"),
+    ("I need airline tickets", "FLIGHT"),
+    ("Show me hotel options", "HOTEL"),
+    ("Create an itinerary for Japan", "ITINERARY"),
+    # README examples
+    ("Plan a 7-day trip to Italy.", "ITINERARY"),
+    ("I need a flight from NYC to London next month.", "FLIGHT"),
+    ("Find a hotel in Tokyo for 3 nights for 2 adults.", "HOTEL"),
+    ("Find me a good hotel in New Delhi on 15 July 2025 for 1 night for 1 adult", "HOTEL"),
+    # Typical traffic
+    ("Cheapest way to fly from DEL to LHR on 1 August", "FLIGHT"),
+    ("JFK to CDG round trip in October for 2 adults", "FLIGHT"),
+    ("Are there any non-stop options from Boston to Dublin?", "FLIGHT"),
+    ("Which airlines go from Mumbai to Singapore?", "FLIGHT"),
+    ("Any 4-star resorts in Phuket with a pool?", "HOTEL"),
+    ("I need a room near Times Square, check-in Friday", "HOTEL"),
+    ("Recommend a hostel in Berlin for two nights", "HOTEL"),
+    ("Good accommodation options in Lisbon for a family", "HOTEL"),
+    ("What are the must-see things to do in Kyoto?", "ITINERARY"),
+    ("What's the weather like in Iceland in March?", "ITINERARY"),
+    ("Suggest food I should try in Bangkok", "ITINERARY"),
+    ("Give me a 3 days plan for Paris with museums", "ITINERARY"),
+    ("Best places to visit in Portugal", "ITINERARY"),
+    ("Hi there!", "ITINERARY"),
+    # One request that mentions other topics - must not fan out
+    ("Find hotels near the top attractions in Rome", "HOTEL"),
+    ("Plan my trip: book a hotel in Rome", "HOTEL"),
+    ("Find a hotel near the airport and the beach", "HOTEL"),
+    ("Plan my 5-day trip to Italy with museums and food", "ITINERARY"),
+    # Objects the traveller already has or rules out - not requests
+    ("I need a room and flights are booked already", "HOTEL"),
+    ("Plan a 3-day itinerary, I already have flights and a hotel", "ITINERARY"),
+    ("Find hotel deals, flights too expensive", "HOTEL"),
+    ("Compare hotel prices, the flights are fixed", "HOTEL"),
+    ("I don't need flights, find a hotel in Rome", "HOTEL"),
+    # Several explicit requests - fan out to every agent asked for
+    ("I want to fly to Paris and stay in a hotel", ("FLIGHT", "HOTEL")),
+    ("Book a flight to Rome and find a hotel near the Colosseum", ("FLIGHT", "HOTEL")),
+    ("Find flights from JFK to LHR, a hotel in London and a 3-day itinerary", ("FLIGHT", "HOTEL", "ITINERARY")),
+    ("flights Delhi→London on 1 Aug plus a 4-star hotel and a 3-day plan", ("FLIGHT", "HOTEL", "ITINERARY")),
+    ("Book me a flight and a hotel in Tokyo", ("FLIGHT", "HOTEL")),
+    ("JFK to CDG round trip and a hotel", ("FLIGHT", "HOTEL")),
+]
+
+def main():
+    use_llm = "--llm" in sys.argv
+    results = evaluate_router(ROUTER_EVAL_SET, use_llm=use_llm)
+
+    print("\n📋 Router evaluation")
+    print("=" * 50)
+    print(f"Accuracy: {results['accuracy']:.1%} ({results['correct']}/{results['total']})")
+    for source, path in results["paths"].items():
+        latencies = sorted(path["latency_ms"])
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(
+            f"  {source:<8} n={path['count']:<3} accuracy={path['correct'] / path['count']:.1%} "
+            f"p50={statistics.median(latencies):.3f}ms p95={p95:.3f}ms"
+        )
+    for query, expected, got, source in results["errors"]:
+        print(f"  ❌ {query!r}: expected {expected}, got {got} ({source})")
+
+if __name__ == "__main__":
+    main()
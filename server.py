@@ -0,0 +1,194 @@
+"""Async HTTP entry point - serves many chat sessions concurrently on one event loop.
+
+Run with: python server.py [--host 0.0.0.0] [--port 8000]
+
+    POST /chat   {"thread_id": "abc", "message": "Find hotels in Tokyo"}
+    GET  /health
+    GET  /metrics  (Prometheus text format)
+"""
+import os
+import json
+import asyncio
+import argparse
+
+from langchain_core.messages import HumanMessage
+
+from metrics import render_prometheus
+
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", 256))
+MAX_PENDING_PER_SESSION = int(os.getenv("MAX_PENDING_PER_SESSION", 2))
+TURN_TIMEOUT = float(os.getenv("TURN_TIMEOUT", 120))
+MAX_BODY_BYTES = 64 * 1024
+
+class SessionBusyError(Exception):
+    """Raised when a session already has MAX_PENDING_PER_SESSION turns queued"""
+
+class BadRequestError(Exception):
+    """Raised for a malformed request line or headers (answered with 400)"""
+
+class PayloadTooLargeError(Exception):
+    """Raised when Content-Length exceeds MAX_BODY_BYTES (answered with 413)"""
+
+class _Session:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+class ChatService:
+    """Runs conversation turns through a compiled graph with per-session backpressure
+
+    Turns for the same thread_id run one at a time (so checkpoints never race) and
+    at most max_pending_per_session may wait; across sessions, up to
+    max_concurrent_turns run at once. Pass any graph exposing ainvoke - e.g. one
+    built with fake LLM and search stand-ins for testing.
+    """
+
+    def __init__(self, graph, max_concurrent_turns: int = MAX_CONCURRENT_TURNS,
+                 max_pending_per_session: int = MAX_PENDING_PER_SESSION, turn_timeout: float = TURN_TIMEOUT):
+        self.graph = graph
+        self.max_pending_per_session = max_pending_per_session
+        self.turn_timeout = turn_timeout
+        self._turn_slots = asyncio.Semaphore(max_concurrent_turns)
+        self._sessions = {}
+
+    @property
+    def active_sessions(self) -> int:
+        return len(self._sessions)
+
+    async def chat(self, thread_id: str, message: str) -> dict:
+        session = self._sessions.setdefault(thread_id, _Session())
+        if session.pending >= self.max_pending_per_session:
+            raise SessionBusyError(f"Session {thread_id} already has {session.pending} pending turns")
+
+        session.pending += 1
+        try:
+            async with session.lock, self._turn_slots:
+                result = await asyncio.wait_for(
+                    self.graph.ainvoke(
+                        {"messages": [HumanMessage(content=message)]},
+                        {"configurable": {"thread_id": thread_id}},
+                    ),
+                    self.turn_timeout,
+                )
+        finally:
+            session.pending -= 1
+            if session.pending == 0:
+                self._sessions.pop(thread_id, None)
+
+        return {
+            "thread_id": thread_id,
+            "agent": result.get("next_agent"),
+            "response": result["messages"][-1].content,
+        }
+
+# --- Minimal HTTP/1.1 front end (stdlib only) --- #
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+               429: "Too Many Requests", 500: "Internal Server Error", 504: "Gateway Timeout"}
+
+async def _write_response(writer, status: int, payload, content_type: str = "application/json"):
+    body = json.dumps(payload).encode() if content_type == "application/json" else payload.encode()
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise BadRequestError(f"malformed request line: {request_line[:100]!r}") from None
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise BadRequestError("invalid Content-Length") from None
+    if length < 0:
+        raise BadRequestError("invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise PayloadTooLargeError("payload too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+def make_handler(service: ChatService):
+    async def handle(reader, writer):
+        try:
+            try:
+                request = await _read_request(reader)
+            except BadRequestError as e:
+                await _write_response(writer, 400, {"error": str(e)})
+                return
+            except PayloadTooLargeError as e:
+                await _write_response(writer, 413, {"error": str(e)})
+                return
+            if request is None:
+                return
+            method, path, body = request
+
+            if method == "GET" and path == "/health":
+                await _write_response(writer, 200, {"status": "ok", "active_sessions": service.active_sessions})
+                return
+            if method == "GET" and path == "/metrics":
+                await _write_response(writer, 200, render_prometheus(), "text/plain; version=0.0.4")
+                return
+            if method != "POST" or path != "/chat":
+                await _write_response(writer, 404, {"error": f"no route for {method} {path}"})
+                return
+
+            try:
+                payload = json.loads(body or b"{}")
+                thread_id, message = str(payload["thread_id"]), str(payload["message"])
+            except (ValueError, KeyError, TypeError) as e:
+                await _write_response(writer, 400, {"error": f"invalid request: {e}"})
+                return
+
+            try:
+                await _write_response(writer, 200, await service.chat(thread_id, message))
+            except SessionBusyError as e:
+                await _write_response(writer, 429, {"error": str(e)})
+            except asyncio.TimeoutError:
+                await _write_response(writer, 504, {"error": "turn timed out"})
+            except Exception as e:
+                print(f"⚠️ Turn failed for thread {thread_id}: {e}")
+                await _write_response(writer, 500, {"error": "internal error"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+async def serve(graph, host: str = "127.0.0.1", port: int = 8000):
+    service = ChatService(graph)
+    server = await asyncio.start_server(make_handler(service), host, port)
+    print(f"🌐 Travel planner listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the travel planner over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from graph_builder import warm_up
+
+    # Build the graph and every client now, so the first request doesn't pay for it
+    asyncio.run(serve(warm_up(), args.host, args.port))
+
+if __name__ == "__main__":
+    main()
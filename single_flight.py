@@ -0,0 +1,84 @@
+"""Single-flight coalescing of identical in-flight calls.
+
+When many sessions ask for the same search at the same moment (JFK→LHR this
+weekend, hotels in Paris for the same dates) only the first caller - the leader -
+hits the provider. Callers arriving while it runs join it and receive its result,
+or its exception, instead of paying for another upstream request. Sync and async
+callers share one map, so a thread and a coroutine asking for the same key still
+make a single call.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from metrics import record_single_flight
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key - results are not kept once the call finishes"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {} # key -> concurrent.futures.Future of the leader's call
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def _join_or_lead(self, key: str):
+        """(future, is_leader) - the leader must finish the future with _finish"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                record_single_flight(self.name, "follower")
+                return future, False
+            future = self._calls[key] = Future()
+        record_single_flight(self.name, "leader")
+        return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException = None):
+        # Forget the key first, so a caller arriving now starts a fresh call instead
+        # of joining one that has already completed
+        with self._lock:
+            self._calls.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, func):
+        """Returns func(), or the result of the identical call already in flight"""
+        future, leader = self._join_or_lead(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, coro_func):
+        """Async version of do - coro_func() is awaited by the leader only
+
+        The leader's call runs as its own task, so a cancelled leader stops waiting
+        without cancelling the request its followers depend on.
+        """
+        future, leader = self._join_or_lead(key)
+        if not leader:
+            # Shielded - a cancelled follower stops waiting without cancelling the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        async def run():
+            try:
+                result = await coro_func()
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, result)
+            return result
+
+        return await asyncio.shield(asyncio.ensure_future(run()))
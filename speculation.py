@@ -0,0 +1,94 @@
+"""Speculative agent execution overlapped with LLM routing.
+
+When a query needs the LLM router, the most likely agent's first LLM call is
+started at the same time. If the router agrees, the agent reuses that response
+and the turn saves one Gemini round trip. Otherwise the speculative call is
+cancelled (async) or its result discarded (sync - a running thread can't be
+stopped). Enable with SPECULATIVE_ROUTING=1.
+"""
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from history import peek_history
+from metrics import record_speculation
+
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "").lower() in ("1", "true", "yes")
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SPECULATION_MAX_WORKERS", 8)), thread_name_prefix="speculation")
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    return func(*args), time.perf_counter() - start
+
+async def _atimed(func, *args):
+    start = time.perf_counter()
+    return await func(*args), time.perf_counter() - start
+
+class Speculation:
+    """A predicted agent's first step, running while the router decides"""
+
+    def __init__(self, next_agent: str, pending):
+        self.next_agent = next_agent
+        self.pending = pending # concurrent.futures.Future or asyncio.Task of (response, duration)
+
+    @classmethod
+    def start(cls, next_agent: str, state):
+        """Starts the speculative step on a worker thread - None when history must be folded first"""
+        from agents import speculative_step
+
+        messages = peek_history(state)
+        if messages is None:
+            record_speculation(next_agent, "skipped")
+            return None
+        ctx = contextvars.copy_context()
+        return cls(next_agent, _executor.submit(ctx.run, _timed, speculative_step, next_agent, messages))
+
+    @classmethod
+    def astart(cls, next_agent: str, state):
+        """Starts the speculative step as a task on the running event loop"""
+        from agents import aspeculative_step
+
+        messages = peek_history(state)
+        if messages is None:
+            record_speculation(next_agent, "skipped")
+            return None
+        return cls(next_agent, asyncio.create_task(_atimed(aspeculative_step, next_agent, messages)))
+
+    def _outcome(self, response, duration: float, router_duration: float):
+        from agents import AGENT_CHAINS
+
+        # Serial cost was router + step, overlapped it is the longer of the two
+        saved = min(router_duration, duration)
+        record_speculation(self.next_agent, "hit", saved)
+        return {"agent": AGENT_CHAINS[self.next_agent][0], "response": response}
+
+    def resolve(self, next_agent: str, router_duration: float):
+        """Returns the state value for "speculation" once the router has decided"""
+        if next_agent != self.next_agent:
+            self.pending.cancel()
+            record_speculation(self.next_agent, "miss")
+            return None
+        try:
+            response, duration = self.pending.result()
+        except Exception as e:
+            print(f"⚠️ Speculative step failed, running it again: {e}")
+            record_speculation(self.next_agent, "error")
+            return None
+        return self._outcome(response, duration, router_duration)
+
+    async def aresolve(self, next_agent: str, router_duration: float):
+        """Async version of resolve - a wrong guess is cancelled mid-flight"""
+        if next_agent != self.next_agent:
+            self.pending.cancel()
+            record_speculation(self.next_agent, "miss")
+            return None
+        try:
+            response, duration = await self.pending
+        except Exception as e:
+            print(f"⚠️ Speculative step failed, running it again: {e}")
+            record_speculation(self.next_agent, "error")
+            return None
+        return self._outcome(response, duration, router_duration)
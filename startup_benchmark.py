@@ -0,0 +1,112 @@
+"""Cold-start benchmark - each stage is measured in a fresh interpreter.
+
+Stages: importing graph_builder, building the planner, and warming up every
+client and agent chain (what server.py does before it accepts requests).
+No network calls are made - clients are constructed, not used.
+
+    python startup_benchmark.py                          # median of 5 runs
+    python startup_benchmark.py --json startup.json      # save results
+    python startup_benchmark.py --baseline startup.json  # fail on >20% regression
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+STAGE_SCRIPT = """
+import os, sys, json, time, contextlib, io
+for key in ("GOOGLE_API_KEY", "TAVILY_API_KEY", "SERPAPI_API_KEY"):
+    os.environ.setdefault(key, "startup-benchmark")
+timings = {}
+start = time.perf_counter()
+import graph_builder
+timings["import_s"] = time.perf_counter() - start
+timings["heavy_modules_loaded_at_import"] = [m for m in graph_builder.HEAVY_MODULES if m in sys.modules]
+with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    graph_builder.build_travel_planner({"checkpointer": "memory"})
+    timings["build_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    graph_builder.warm_up({"checkpointer": "memory"})
+    timings["warm_up_s"] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+def _run(script: str, *flags) -> subprocess.CompletedProcess:
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, *flags, "-c", script], cwd=here,
+                            capture_output=True, text=True, check=True)
+    return result
+
+def measure_once() -> dict:
+    return json.loads(_run(STAGE_SCRIPT).stdout.strip().splitlines()[-1])
+
+def slowest_imports(limit: int = 10) -> list:
+    """Modules imported by `import graph_builder` (and their direct imports) by cumulative time
+
+    Parsed from python -X importtime, which indents each nested import by two spaces.
+    """
+    stderr = _run("import graph_builder", "-X", "importtime").stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth in (1, 2):
+            rows.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:limit]
+
+def run_startup_benchmark(runs: int = 5) -> dict:
+    samples = [measure_once() for _ in range(runs)]
+    return {
+        "runs": runs,
+        **{stage: statistics.median(sample[stage] for sample in samples) for stage in ("import_s", "build_s", "warm_up_s")},
+        "heavy_modules_loaded_at_import": samples[0]["heavy_modules_loaded_at_import"],
+        "slowest_imports": slowest_imports(),
+    }
+
+def print_report(results: dict):
+    print("\n🚀 Travel planner cold start")
+    print("=" * 50)
+    print(f"import graph_builder: {results['import_s']:.3f}s")
+    print(f"build_travel_planner: {results['build_s']:.3f}s")
+    print(f"warm_up (clients):    {results['warm_up_s']:.3f}s")
+    print(f"Heavy modules loaded at import: {results['heavy_modules_loaded_at_import'] or 'none'}")
+    print("Slowest imports:")
+    for name, seconds in results["slowest_imports"]:
+        print(f"   {seconds:.3f}s  {name}")
+
+def check_regression(results: dict, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    ok = True
+    for stage in ("import_s", "build_s", "warm_up_s"):
+        current, previous = results[stage], baseline[stage]
+        change = (current - previous) / previous if previous else 0.0
+        marker = "❌" if change > max_regression else "✅"
+        ok = ok and change <= max_regression
+        print(f"{marker} {stage}: {previous:.3f} → {current:.3f} ({change:+.1%})")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for travel_planner")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json output")
+    parser.add_argument("--max-regression", type=float, default=0.20)
+    args = parser.parse_args()
+
+    results = run_startup_benchmark(args.runs)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline and not check_regression(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
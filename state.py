@@ -8,15 +8,39 @@ class TravelState(TypedDict, total=False):
     itinerary: str           # multi-day plan
     activities: str          # granular activities
 
+def add_or_reset(left: list, right: Optional[list]) -> list:
+    """List reducer like operator.add, except that writing None clears the list"""
+    if right is None:
+        return []
+    return (left or []) + right
+
 class TravelPlannerState(TypedDict):
     """Simple state schema for travel multiagent system"""
 
     # Conversation history - persisted with checkpoint memory
     messages: Annotated[List[BaseMessage], operator.add]
 
-    # Agent routing
+    # Agent routing - next_agents holds every agent of a multi-intent query, which
+    # then run as parallel branches; next_agent is the first of them
     next_agent: Optional[str]
+    next_agents: Optional[List[str]]
+
+    # Branch answers of a multi-intent turn ({"agent", "content"}), combined by the
+    # merge node. The router resets this at the start of every turn
+    agent_answers: Annotated[List[dict], add_or_reset]
+
+    # Which path made the routing decision ("local", "local_multi", "llm" or "fallback")
+    route_source: Optional[str]
 
     # Current user query
     user_query: Optional[str]
+
+    # First-step response of the agent the router speculatively started
+    # ({"agent", "response"}) - set only when the router's decision matched
+    speculation: Optional[dict]
+
+    # Running summary of turns folded out of the prompt window, and how many
+    # messages (from the start of messages) it covers
+    summary: Optional[str]
+    summarized_count: Optional[int]
     
\ No newline at end of file
@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from langchain_core.messages import ToolMessage
+
+from events import emit_event
+from metrics import record_tool_call
+
+# Shared, bounded pool for all agents - sized for I/O-bound search calls
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", 16))
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", 30))
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool-call")
+
+class ToolHandler:
+    """Maps a tool call's args to a search function and labels its failures
+
+    afunc is an optional native coroutine version; without it the async path
+    runs func on the shared pool so the event loop is never blocked.
+    """
+
+    def __init__(self, func, error_label: str, timeout: float = None, afunc=None):
+        self.func = func
+        self.error_label = error_label
+        self.timeout = timeout
+        self.afunc = afunc
+
+    def __call__(self, args: dict) -> str:
+        return self.func(args)
+
+    async def acall(self, args: dict) -> str:
+        if self.afunc is not None:
+            return await self.afunc(args)
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(_executor, ctx.run, self.func, args)
+
+def _timeout_for(handler: ToolHandler, timeout: float) -> float:
+    return handler.timeout if handler.timeout is not None else timeout
+
+def _timed_call(handler: ToolHandler, args: dict):
+    """Runs in the worker so the recorded duration excludes time spent waiting on earlier results"""
+    start = time.perf_counter()
+    content = handler(args)
+    return content, time.perf_counter() - start
+
+def execute_tool_calls(tool_calls, handlers: dict, timeout: float = TOOL_CALL_TIMEOUT):
+    """Runs every tool call from one LLM turn concurrently and returns ToolMessages
+
+    Messages come back in the same order as tool_calls (so each one stays paired
+    with its tool_call_id). A failing or timed-out call produces an error message
+    for the LLM to read and does not affect the other calls.
+    """
+    pending = []
+    for tool_call in tool_calls:
+        handler = handlers.get(tool_call['name'])
+        if handler is None:
+            pending.append((tool_call, None, None))
+            continue
+        emit_event("tool_start", tool=tool_call['name'], tool_call_id=tool_call['id'])
+        # Copy the context so callbacks/tracing set up by the caller reach the worker thread
+        ctx = contextvars.copy_context()
+        future = _executor.submit(ctx.run, _timed_call, handler, tool_call['args'])
+        pending.append((tool_call, handler, future))
+
+    started = time.monotonic()
+    tool_messages = []
+    for tool_call, handler, future in pending:
+        if handler is None:
+            content = f"Unknown tool: {tool_call['name']}"
+        else:
+            call_timeout = _timeout_for(handler, timeout)
+            remaining = max(0.0, call_timeout - (time.monotonic() - started))
+            ok = False
+            try:
+                content, duration = future.result(timeout=remaining)
+                ok = True
+            except FutureTimeoutError:
+                future.cancel()
+                content = f"{handler.error_label}: timed out after {call_timeout:g}s"
+            except Exception as e:
+                content = f"{handler.error_label}: {str(e)}"
+            if not ok:
+                duration = time.monotonic() - started
+            record_tool_call(tool_call['name'], duration, content, ok)
+            emit_event("tool_end", tool=tool_call['name'], tool_call_id=tool_call['id'], ok=ok)
+
+        tool_messages.append(ToolMessage(
+            content=content,
+            tool_call_id=tool_call['id']
+        ))
+
+    return tool_messages
+
+async def aexecute_tool_calls(tool_calls, handlers: dict, timeout: float = TOOL_CALL_TIMEOUT):
+    """Async version of execute_tool_calls with the same ordering and isolation guarantees"""
+
+    async def run(tool_call):
+        handler = handlers.get(tool_call['name'])
+        if handler is None:
+            content = f"Unknown tool: {tool_call['name']}"
+        else:
+            call_timeout = _timeout_for(handler, timeout)
+            emit_event("tool_start", tool=tool_call['name'], tool_call_id=tool_call['id'])
+            ok = False
+            start = time.perf_counter()
+            try:
+                content = await asyncio.wait_for(handler.acall(tool_call['args']), call_timeout)
+                ok = True
+            except asyncio.TimeoutError:
+                content = f"{handler.error_label}: timed out after {call_timeout:g}s"
+            except Exception as e:
+                content = f"{handler.error_label}: {str(e)}"
+            record_tool_call(tool_call['name'], time.perf_counter() - start, content, ok)
+            emit_event("tool_end", tool=tool_call['name'], tool_call_id=tool_call['id'], ok=ok)
+
+        return ToolMessage(
+            content=content,
+            tool_call_id=tool_call['id']
+        )
+
+    return list(await asyncio.gather(*(run(tool_call) for tool_call in tool_calls)))
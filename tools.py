@@ -1,12 +1,81 @@
 import os
-import json
-import serpapi
-from langchain_tavily import TavilySearch
-from langchain.tools import Tool
+from functools import lru_cache
+
+from cache import caches, cache_stats, flight_cache_key, hotel_cache_key, tavily_cache_key
+from projection import project_flight, project_flights, project_hotels, project_web_results, projection_stats
+from metrics import record_cache_lookup, register_gauge
+from transport import providers
+from single_flight import SingleFlight
+from fare_index import (
+    FARE_PREFETCH_DAYS, flight_fares, hotel_rates, flight_route, hotel_area, trip_days,
+    index_flights, index_hotels, prefetch_dates, prefetcher,
+    query_flight_fares, query_hotel_rates,
+)
+
+# Scrape-time gauges for /metrics
+register_gauge("travel_cache_entries", "Entries held per tool cache",
+               lambda: [({"cache": name}, s["size"]) for name, s in cache_stats().items()])
+register_gauge("travel_cache_evictions", "LRU evictions per tool cache since start",
+               lambda: [({"cache": name}, s["evictions"]) for name, s in cache_stats().items()])
+register_gauge("travel_tool_result_tokens", "Estimated tool-result tokens before and after projection",
+               lambda: [({"tool": name, "stage": stage}, totals[f"{stage}_tokens"])
+                        for name, totals in projection_stats.snapshot().items() for stage in ("raw", "projected")])
+
+# Identical searches already in flight are joined instead of sent again - see single_flight.py
+in_flight = {name: SingleFlight(name) for name in ("flights", "hotels", "tavily")}
+register_gauge("travel_searches_in_flight", "Distinct upstream searches currently running",
+               lambda: [({"search": name}, flights.in_flight()) for name, flights in in_flight.items()])
+
+# Clients and tool objects are built on first use so importing this module stays cheap.
+# The old module attributes (tool, tools, search_flights_tool, search_hotels_tool) still
+# work through __getattr__ at the bottom of the file.
 
 # Tavily Search Tool
-tool = TavilySearch(max_results=2)
-tools = [tool] # for binding to itinerary agent
+@lru_cache(maxsize=None)
+def get_tavily_tool(max_results: int = 2):
+    """Returns a shared TavilySearch tool per max_results
+
+    The itinerary agent binds it for its tool schema; the searches themselves go
+    through tavily_search and the shared transport.
+    """
+    from langchain_tavily import TavilySearch
+    return TavilySearch(max_results=max_results)
+
+def tavily_search(query: str, max_results: int = 2) -> str:
+    """Runs a Tavily web search, serving repeated queries from the tavily cache"""
+    key = tavily_cache_key(query, max_results)
+    hit, cached = caches["tavily"].get(key)
+    record_cache_lookup("tavily", hit)
+    if hit:
+        return cached
+
+    def fetch():
+        return _store_web_results(key, providers["tavily"].request(
+            "POST", "/search", json_body={"query": query, "max_results": max_results}))
+
+    # Concurrent identical searches share one upstream call (and its failure)
+    return in_flight["tavily"].do(key, fetch)
+
+async def atavily_search(query: str, max_results: int = 2) -> str:
+    """Async version of tavily_search - the request runs on the transport pool"""
+    key = tavily_cache_key(query, max_results)
+    hit, cached = caches["tavily"].get(key)
+    record_cache_lookup("tavily", hit)
+    if hit:
+        return cached
+
+    async def fetch():
+        return _store_web_results(key, await providers["tavily"].arequest(
+            "POST", "/search", json_body={"query": query, "max_results": max_results}))
+
+    return await in_flight["tavily"].ado(key, fetch)
+
+def _store_web_results(key: str, results: dict) -> str:
+    if results.get("error"):
+        raise RuntimeError(results["error"])
+    result = project_web_results(results)
+    caches["tavily"].set(key, result)
+    return result
 
 # Flight Search Tool
 def search_flights(departure_airport: str, arrival_airport: str, outbound_date: str, return_date: str = None, adults: int = 1, children: int = 0) -> str:
@@ -21,6 +90,18 @@ def search_flights(departure_airport: str, arrival_airport: str, outbound_date:
         adults: Number of adult passengers (default: 1)
         children: Number of child passengers (default: 0)
     """
+    key = flight_cache_key(departure_airport, arrival_airport, outbound_date, return_date, adults, children)
+    hit, cached = caches["flights"].get(key)
+    record_cache_lookup("flights", hit)
+    if not hit:
+        # Concurrent identical searches share one upstream call (and its failure)
+        cached = in_flight["flights"].do(key, lambda: _fetch_flights(
+            key, departure_airport, arrival_airport, outbound_date, return_date, adults, children))
+    if FARE_PREFETCH_DAYS:
+        prefetch_flights(departure_airport, arrival_airport, outbound_date, return_date, adults, children)
+    return cached
+
+def _fetch_flights(key, departure_airport, arrival_airport, outbound_date, return_date, adults, children) -> str:
     params = {
         'api_key': os.environ.get('SERPAPI_API_KEY'),
         'engine': 'google_flights',
@@ -36,19 +117,34 @@ def search_flights(departure_airport: str, arrival_airport: str, outbound_date:
         'stops': '1'
     }
 
-    try:
-        search = serpapi.search(params)
-        results = search.data.get('best_flights', [])
-        return json.dumps(results, indent=2)
-    except Exception as e:
-        return f"Flight search failed: {str(e)}"
+    # Failures raise - the tool executor reports them to the agent as "Flight search failed: ..."
+    data = providers["serpapi"].request("GET", "/search.json", params=params)
+    results = data.get('best_flights', [])
+    result = project_flights(results)
+    caches["flights"].set(key, result)
+    index_flights(departure_airport, arrival_airport, outbound_date, return_date, adults, children,
+                  [project_flight(option) for option in results])
+    return result
+
+def prefetch_flights(departure_airport, arrival_airport, outbound_date, return_date=None, adults=1, children=0):
+    """Fetches the same trip FARE_PREFETCH_DAYS either side of outbound_date into the fare index"""
+    route = flight_route(departure_airport, arrival_airport, adults, children, trip_days(outbound_date, return_date))
+    for outbound, inbound in prefetch_dates(outbound_date, return_date):
+        if flight_fares.has(route, (outbound, inbound or "")):
+            continue
+        key = flight_cache_key(departure_airport, arrival_airport, outbound, inbound, adults, children)
+        prefetcher.submit("flights", key, lambda key=key, outbound=outbound, inbound=inbound: in_flight["flights"].do(
+            key, lambda: _fetch_flights(key, departure_airport, arrival_airport, outbound, inbound, adults, children)))
 
 # Define the flight search tool explicitly for binding
-search_flights_tool = Tool.from_function(
-    func=search_flights,
-    name="search_flights",
-    description="Search for flights using Google Flights engine."
-)
+@lru_cache(maxsize=None)
+def get_search_flights_tool():
+    from langchain.tools import Tool
+    return Tool.from_function(
+        func=search_flights,
+        name="search_flights",
+        description="Search for flights using Google Flights engine."
+    )
 
 # Hotel Search Tool
 def search_hotels(location: str, check_in_date: str, check_out_date: str, adults: int = 1, children: int = 0, rooms: int = 1, hotel_class: str = None, sort_by: int = 8) -> str:
@@ -66,6 +162,17 @@ def search_hotels(location: str, check_in_date: str, check_out_date: str, adults
         sort_by: Sort parameter (default: 8 for highest rating)
     """
 
+    key = hotel_cache_key(location, check_in_date, check_out_date, adults, children, rooms, hotel_class, sort_by)
+    hit, cached = caches["hotels"].get(key)
+    record_cache_lookup("hotels", hit)
+    if not hit:
+        cached = in_flight["hotels"].do(key, lambda: _fetch_hotels(
+            key, location, check_in_date, check_out_date, adults, children, rooms, hotel_class, sort_by))
+    if FARE_PREFETCH_DAYS:
+        prefetch_hotels(location, check_in_date, check_out_date, adults, children, rooms, hotel_class, sort_by)
+    return cached
+
+def _fetch_hotels(key, location, check_in_date, check_out_date, adults, children, rooms, hotel_class, sort_by) -> str:
     # Ensure proper integer types
     adults = int(float(adults)) if adults else 1
     children = int(float(children)) if children else 0
@@ -91,22 +198,58 @@ def search_hotels(location: str, check_in_date: str, check_out_date: str, adults
     if hotel_class:
         params['hotel_class'] = hotel_class
 
-    try:
-        search = serpapi.search(params)
-        properties = search.data.get('properties', [])
+    data = providers["serpapi"].request("GET", "/search.json", params=params)
+    properties = data.get('properties', [])
 
-        if not properties:
-            return f"No hotels found. Available data keys: {list(search.data.keys())}"
+    if not properties:
+        return f"No hotels found. Available data keys: {list(data.keys())}"
 
-        # Return top 5 results
-        return json.dumps(properties[:5], indent=2)
+    index_hotels(location, check_in_date, check_out_date, adults, children, rooms, properties)
+    # Return top 5 results, projected to the fields the hotel agent presents
+    result = project_hotels(properties[:5])
+    caches["hotels"].set(key, result)
+    return result
 
-    except Exception as e:
-        return f"Hotel search failed: {str(e)}"
+def prefetch_hotels(location, check_in_date, check_out_date, adults=1, children=0, rooms=1, hotel_class=None, sort_by=8):
+    """Fetches the same stay FARE_PREFETCH_DAYS either side of check_in_date into the fare index"""
+    area = hotel_area(location, adults, children, rooms)
+    for check_in, check_out in prefetch_dates(check_in_date, check_out_date):
+        if hotel_rates.has(area, (check_in, check_out or "")):
+            continue
+        key = hotel_cache_key(location, check_in, check_out, adults, children, rooms, hotel_class, sort_by)
+        prefetcher.submit("hotels", key, lambda key=key, check_in=check_in, check_out=check_out: in_flight["hotels"].do(
+            key, lambda: _fetch_hotels(key, location, check_in, check_out, adults, children, rooms, hotel_class, sort_by)))
 
 # Define the hotel search tool explicitly for binding
-search_hotels_tool = Tool.from_function(
-    func=search_hotels,
-    name="search_hotels",
-    description="Search for hotels using Google Hotels engine."
-)
+@lru_cache(maxsize=None)
+def get_search_hotels_tool():
+    from langchain.tools import Tool
+    return Tool.from_function(
+        func=search_hotels,
+        name="search_hotels",
+        description="Search for hotels using Google Hotels engine."
+    )
+
+# Local lookups over the fare index - bound to the flight and hotel agents when FARE_PREFETCH_DAYS is set.
+# StructuredTool keeps the keyword arguments, so the LLM sees a proper argument schema.
+@lru_cache(maxsize=None)
+def get_query_flight_fares_tool():
+    from langchain.tools import StructuredTool
+    return StructuredTool.from_function(func=query_flight_fares, name="query_flight_fares")
+
+@lru_cache(maxsize=None)
+def get_query_hotel_rates_tool():
+    from langchain.tools import StructuredTool
+    return StructuredTool.from_function(func=query_hotel_rates, name="query_hotel_rates")
+
+_LAZY_ATTRIBUTES = {
+    "tool": get_tavily_tool,
+    "tools": lambda: [get_tavily_tool()], # for binding to itinerary agent
+    "search_flights_tool": get_search_flights_tool,
+    "search_hotels_tool": get_search_hotels_tool,
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,284 @@
+"""Shared HTTP transport for the external search providers (SerpAPI, Tavily).
+
+Every provider call goes through Provider.request, which adds:
+- keep-alive connection pooling (one requests.Session per provider)
+- a per-call deadline covering queueing, all attempts and backoff sleeps
+- retries with full-jitter exponential backoff on timeouts, connection errors,
+  408/429/5xx (Retry-After is honoured when it fits the deadline)
+- a circuit breaker that fails fast while a provider is down
+- a cap on concurrent in-flight requests per provider
+- the provider's token-bucket rate limit (rate_limits.py), once per attempt
+
+Base URLs can be pointed at a local stub server (see transport_benchmark.py).
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import record_provider_request, register_gauge
+from rate_limits import acquire
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+CONNECT_TIMEOUT = 3.05
+
+class TransportError(RuntimeError):
+    """A provider call that failed after the transport's retry policy ran out"""
+
+class CircuitOpenError(TransportError):
+    pass
+
+class DeadlineExceeded(TransportError):
+    pass
+
+class ProviderHTTPError(TransportError):
+    def __init__(self, provider: str, status: int, detail: str = "", retry_after: float = None):
+        super().__init__(f"{provider} returned HTTP {status}" + (f": {detail}" if detail else ""))
+        self.status = status
+        self.retry_after = retry_after
+
+# --- Circuit breaker --- #
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and fails fast for `reset_timeout` seconds
+
+    After that a single probe call is let through (half-open). Its success closes
+    the circuit, its failure opens it again for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """None when the call must fail fast, else "call" - or "probe" for the single half-open trial"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return "call"
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return "probe"
+            return None
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def release_probe(self):
+        """Gives up a half-open probe without a verdict, e.g. when the caller's deadline ran out first"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self, probe: bool = False):
+        with self._lock:
+            self.failures += 1
+            if probe or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            if probe:
+                self._probing = False
+
+def describe_error(error: Exception) -> str:
+    """Error text that is safe to show the agent, print or checkpoint
+
+    requests' own messages embed the full URL - query string and api_key included -
+    so only HTTP errors (status plus a body excerpt) keep their message.
+    """
+    if isinstance(error, ProviderHTTPError):
+        return str(error)
+    return type(error).__name__
+
+# --- Provider --- #
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full jitter: uniform between 0 and the capped exponential step"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+class Provider:
+    """Pooled, rate-limited, retrying HTTP client for one search provider"""
+
+    def __init__(self, name: str, base_url: str, max_concurrency: int = 8, deadline: float = 20.0,
+                 read_timeout: float = 10.0, max_retries: int = 2, backoff_base: float = 0.25,
+                 backoff_max: float = 4.0, breaker: CircuitBreaker = None, headers=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.headers = headers # callable returning per-request headers, e.g. auth read from the environment
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """requests.Session with a keep-alive pool sized to the concurrency cap, created on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def send(self, method: str, path: str, params: dict = None, json_body: dict = None, timeout: float = None) -> dict:
+        """One HTTP attempt - returns the decoded JSON body or raises
+
+        This is the only method that touches the network; fakes.py replaces it.
+        """
+        response = self.session.request(
+            method, self.base_url + path, params=params, json=json_body,
+            headers=self.headers() if self.headers else None,
+            timeout=(min(CONNECT_TIMEOUT, timeout), timeout),
+        )
+        if response.status_code >= 400:
+            retry_after = response.headers.get("Retry-After")
+            raise ProviderHTTPError(
+                self.name, response.status_code, response.text[:200],
+                float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        return response.json()
+
+    def _retryable(self, error: Exception) -> bool:
+        import requests
+
+        if isinstance(error, ProviderHTTPError):
+            return error.status in RETRYABLE_STATUS
+        return isinstance(error, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError))
+
+    def request(self, method: str, path: str, params: dict = None, json_body: dict = None, deadline: float = None) -> dict:
+        """Sends a request under the provider's deadline, retry, breaker and concurrency policy"""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        remaining = lambda: deadline_at - time.monotonic()
+
+        if self.breaker.state == "open":
+            self._fail_fast()
+        if not self._slots.acquire(timeout=max(0.0, remaining())):
+            record_provider_request(self.name, "queue_timeout")
+            raise DeadlineExceeded(f"{self.name}: no free connection within {deadline or self.deadline:g}s")
+        try:
+            grant = self.breaker.allow()
+            if grant is None:
+                self._fail_fast()
+            return self._attempts(method, path, params, json_body, remaining, grant)
+        finally:
+            self._slots.release()
+
+    def _fail_fast(self):
+        record_provider_request(self.name, "circuit_open")
+        raise CircuitOpenError(f"{self.name} is unavailable, retrying in {self.breaker.retry_in():.0f}s")
+
+    def _attempts(self, method, path, params, json_body, remaining, grant: str) -> dict:
+        """grant is the breaker's answer for this attempt - a probe must end in a verdict or be released"""
+        attempt = 0
+        while True:
+            # A throttled provider must not hold the caller past its deadline either
+            if not acquire(self.name, timeout=max(0.0, remaining())) or remaining() <= 0:
+                if grant == "probe":
+                    self.breaker.release_probe()
+                record_provider_request(self.name, "deadline")
+                raise DeadlineExceeded(f"{self.name}: deadline exceeded after {attempt} attempt(s)")
+            timeout = min(self.read_timeout, remaining())
+            start = time.perf_counter()
+            try:
+                data = self.send(method, path, params, json_body, timeout)
+            except Exception as e:
+                duration = time.perf_counter() - start
+                if not self._retryable(e):
+                    # The request itself is wrong (bad key, bad params) - no verdict on the provider's health
+                    if grant == "probe":
+                        self.breaker.release_probe()
+                    record_provider_request(self.name, "error", duration)
+                    if isinstance(e, ProviderHTTPError):
+                        raise
+                    raise TransportError(f"{self.name} {path} failed: {describe_error(e)}") from None
+                self.breaker.record_failure(probe=grant == "probe")
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if getattr(e, "retry_after", None):
+                    delay = max(delay, e.retry_after)
+                if attempt >= self.max_retries or delay >= remaining() or (grant := self.breaker.allow()) is None:
+                    record_provider_request(self.name, "error", duration)
+                    raise TransportError(
+                        f"{self.name} {path} failed after {attempt + 1} attempt(s): {describe_error(e)}"
+                    ) from None
+                record_provider_request(self.name, "retry", duration)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            record_provider_request(self.name, "ok", time.perf_counter() - start)
+            return data
+
+    async def arequest(self, method: str, path: str, params: dict = None, json_body: dict = None, deadline: float = None) -> dict:
+        """Async version of request - runs on the transport pool so the event loop never blocks"""
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            _executor, ctx.run, lambda: self.request(method, path, params, json_body, deadline)
+        )
+
+def _provider_settings(prefix: str) -> dict:
+    return {
+        "max_concurrency": int(os.getenv(f"{prefix}_MAX_CONCURRENCY", 8)),
+        "deadline": _env_float(f"{prefix}_DEADLINE", _env_float("SEARCH_DEADLINE", 20)),
+        "read_timeout": _env_float(f"{prefix}_READ_TIMEOUT", 10),
+        "max_retries": int(os.getenv("SEARCH_MAX_RETRIES", 2)),
+        "breaker": CircuitBreaker(
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5)),
+            reset_timeout=_env_float("CIRCUIT_RESET_TIMEOUT", 30),
+        ),
+    }
+
+providers = {
+    "serpapi": Provider("serpapi", os.getenv("SERPAPI_BASE_URL", "https://serpapi.com"), **_provider_settings("SERPAPI")),
+    "tavily": Provider(
+        "tavily", os.getenv("TAVILY_BASE_URL", "https://api.tavily.com"), **_provider_settings("TAVILY"),
+        headers=lambda: {"Authorization": f"Bearer {os.environ.get('TAVILY_API_KEY', '')}"},
+    ),
+}
+
+# Threads blocked on a provider's concurrency cap must not starve other work, so the
+# async path gets its own pool with room for every provider's in-flight requests
+_executor = ThreadPoolExecutor(
+    max_workers=sum(provider.max_concurrency for provider in providers.values()) * 2,
+    thread_name_prefix="transport",
+)
+
+register_gauge("travel_provider_circuit_open", "1 while a provider's circuit breaker is failing fast",
+               lambda: [({"provider": name}, int(p.breaker.state == "open")) for name, p in providers.items()])
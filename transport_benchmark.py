@@ -0,0 +1,283 @@
+"""Resilience check for transport.py against a local stub provider - no network or API keys needed.
+
+A stub HTTP server on 127.0.0.1 plays a healthy, flaky, hanging, throttling and
+dead provider in turn. Each scenario fires concurrent requests through a
+transport.Provider and reports outcomes, p50/p99 latency and the number of TCP
+connections opened, then checks the expected behaviour:
+
+- healthy:  every call succeeds over at most max_concurrency pooled connections
+- flaky:    30% of first attempts return 503 - retries hide every failure
+- hanging:  20% of first attempts never answer - the read timeout plus a retry bounds p99
+- throttled: 429 with Retry-After: 0 on the first attempt - retried and served
+- down:     every attempt fails - the breaker opens and later calls fail in milliseconds
+- rate_limited: a 5 rps token bucket and a 1s deadline - callers over quota give up at the deadline
+- refused:  nothing listens on the port - connection errors are reported without the URL
+
+Every request carries an api_key parameter, and no error message may contain it.
+
+It also checks single-flight coalescing (single_flight.py): one upstream call for
+concurrent identical requests, and a cancelled follower doesn't cancel the others.
+
+    python transport_benchmark.py                # exits 1 when a check fails
+    python transport_benchmark.py --json transport.json
+"""
+import sys
+import json
+import asyncio
+import time
+import random
+import socket
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rate_limits
+from transport import Provider, CircuitBreaker, CircuitOpenError
+from single_flight import SingleFlight
+
+STUB_LATENCY = 0.02
+STUB_API_KEY = "SECRETKEY123"
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # the default backlog of 5 drops bursts of connects into 1s SYN retries
+
+    def handle_error(self, request, client_address):
+        pass # Clients that timed out close their end - expected in the hanging scenario
+
+class StubState:
+    def __init__(self):
+        self.mode = "healthy"
+        self.attempts = {} # request id -> attempts seen
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    def set_mode(self, mode: str):
+        with self.lock:
+            self.mode = mode
+            self.attempts.clear()
+            self.connections.clear()
+
+    def seen(self, request_id: str, client) -> int:
+        with self.lock:
+            self.connections.add(client)
+            self.attempts[request_id] = self.attempts.get(request_id, 0) + 1
+            return self.attempts[request_id]
+
+def make_handler(state: StubState):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive
+        disable_nagle_algorithm = True # headers and body are separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            request_id = self.path.rsplit("id=", 1)[-1]
+            attempt = state.seen(request_id, self.client_address)
+            mode = state.mode
+            time.sleep(STUB_LATENCY)
+            if mode == "flaky" and attempt == 1 and random.random() < 0.3:
+                return self._reply(503, {"error": "busy"})
+            if mode == "hanging" and attempt == 1 and random.random() < 0.2:
+                time.sleep(5) # longer than the client's read timeout
+                return
+            if mode == "throttled" and attempt == 1:
+                return self._reply(429, {"error": "slow down"}, {"Retry-After": "0"})
+            if mode == "down":
+                return self._reply(500, {"error": "down"})
+            if mode == "unauthorized":
+                return self._reply(401, {"error": "bad key"})
+            self._reply(200, {"ok": True, "attempt": attempt})
+
+    return StubHandler
+
+def run_scenario(provider: Provider, state: StubState, mode: str, requests: int, concurrency: int) -> dict:
+    state.set_mode(mode)
+    outcomes = {"ok": 0, "failed": 0, "circuit_open": 0}
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def call(i):
+        start = time.perf_counter()
+        try:
+            provider.request("GET", "/search.json", params={"api_key": STUB_API_KEY, "id": f"{mode}-{i}"})
+            outcome, error = "ok", None
+        except CircuitOpenError as e:
+            outcome, error = "circuit_open", e
+        except Exception as e:
+            outcome, error = "failed", e
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append(time.perf_counter() - start)
+            if error is not None:
+                errors.append(str(error))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(requests)))
+    latencies.sort()
+    return {
+        **outcomes,
+        "p50_s": round(statistics.median(latencies), 4),
+        "p99_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 4),
+        "connections": len(state.connections),
+        "key_leaks": sum(STUB_API_KEY in text for text in errors),
+    }
+
+def closed_port() -> int:
+    """A local port with nothing listening on it"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run_transport_benchmark(requests: int = 100, concurrency: int = 8, seed: int = 7) -> dict:
+    random.seed(seed)
+    state = StubState()
+    server = StubServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def provider(url=base_url, name="stub", **overrides):
+        settings = {"max_concurrency": 8, "deadline": 3.0, "read_timeout": 0.5, "max_retries": 2,
+                    "backoff_base": 0.05, "backoff_max": 0.2,
+                    "breaker": CircuitBreaker(failure_threshold=50, reset_timeout=60), **overrides}
+        return Provider(name, url, **settings)
+
+    try:
+        results = {mode: run_scenario(provider(), state, mode, requests, concurrency)
+                   for mode in ("healthy", "flaky", "hanging", "throttled")}
+        # A breaker that trips quickly, so most of the burst fails fast
+        results["down"] = run_scenario(
+            provider(max_retries=0, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60)),
+            state, "down", requests, concurrency,
+        )
+        # Rate limits are looked up by provider name, so this one gets its own bucket
+        rate_limits.limiters["stub-limited"] = rate_limits.make_limiter(5)
+        results["rate_limited"] = run_scenario(
+            provider(name="stub-limited", deadline=1.0), state, "healthy", min(requests, 40), concurrency,
+        )
+        results["refused"] = run_scenario(
+            provider(f"http://127.0.0.1:{closed_port()}"), state, "refused", min(requests, 20), concurrency,
+        )
+        results["breaker_probe"] = run_breaker_probe_check(provider, state)
+    finally:
+        rate_limits.limiters.pop("stub-limited", None)
+        server.shutdown()
+    return results
+
+def run_breaker_probe_check(provider, state: StubState) -> dict:
+    """A half-open breaker only settles on its own probe's verdict - a 4xx or a stray deadline is none"""
+    stub = provider(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    state.set_mode("down")
+    try:
+        stub.request("GET", "/search", {"api_key": STUB_API_KEY, "id": "open"})
+    except Exception:
+        pass
+    time.sleep(0.06)
+    state.set_mode("unauthorized")
+    try:
+        stub.request("GET", "/search", {"api_key": STUB_API_KEY, "id": "probe"})
+    except Exception:
+        pass
+    after_4xx = stub.breaker.state
+    # Another call's deadline expiring must not free the probe slot held here
+    probe = stub.breaker.allow()
+    try:
+        stub._attempts("GET", "/search", {"api_key": STUB_API_KEY, "id": "late"}, None, lambda: 0.0, "call")
+    except Exception:
+        pass
+    return {"after_4xx": after_4xx, "probe": probe, "second_probe": stub.breaker.allow()}
+
+def run_single_flight_check(followers: int = 3) -> dict:
+    """Leader plus followers on one key - the first follower is cancelled mid-call"""
+    async def scenario():
+        flight = SingleFlight("check")
+        calls = 0
+
+        async def search():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.1)
+            return "fares"
+
+        leader = asyncio.ensure_future(flight.ado("route", search))
+        await asyncio.sleep(0) # the leader registers the key first
+        waiters = [asyncio.ensure_future(flight.ado("route", search)) for _ in range(followers)]
+        await asyncio.sleep(0.02)
+        waiters[0].cancel()
+        results = await asyncio.gather(leader, *waiters, return_exceptions=True)
+        return {
+            "upstream_calls": calls,
+            "leader": results[0],
+            "cancelled": isinstance(results[1], asyncio.CancelledError),
+            "others": [r for r in results[2:]],
+        }
+
+    return asyncio.run(scenario())
+
+def check_results(results: dict, read_timeout: float = 0.5, max_concurrency: int = 8) -> bool:
+    checks = {
+        "healthy: all ok": results["healthy"]["ok"] == sum(v for k, v in results["healthy"].items() if k in ("ok", "failed", "circuit_open")),
+        "healthy: pooled connections": results["healthy"]["connections"] <= max_concurrency,
+        "flaky: retries hide 503s": results["flaky"]["failed"] == 0,
+        "hanging: all ok": results["hanging"]["failed"] == 0,
+        "hanging: p99 bounded by one read timeout + retry": results["hanging"]["p99_s"] < read_timeout + 1.0,
+        "throttled: all ok": results["throttled"]["failed"] == 0,
+        "down: breaker fails fast": results["down"]["circuit_open"] > 0 and results["down"]["p50_s"] < 0.01,
+        "rate_limited: waits bounded by the deadline": results["rate_limited"]["failed"] > 0
+            and results["rate_limited"]["p99_s"] < 1.0 + 0.3,
+        "refused: every call fails": results["refused"]["ok"] == 0,
+        "errors: no api key in error text": all(r["key_leaks"] == 0 for r in results.values() if "key_leaks" in r),
+        "breaker: a 4xx probe leaves the circuit half-open": results["breaker_probe"]["after_4xx"] == "half_open",
+        "breaker: one probe at a time": results["breaker_probe"]["probe"] == "probe"
+            and results["breaker_probe"]["second_probe"] is None,
+        "single-flight: one upstream call": results["single_flight"]["upstream_calls"] == 1,
+        "single-flight: a cancelled follower leaves the others served": results["single_flight"]["cancelled"]
+            and results["single_flight"]["leader"] == "fares"
+            and all(r == "fares" for r in results["single_flight"]["others"]),
+    }
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    return all(checks.values())
+
+def print_report(results: dict):
+    print("\n🔌 Search transport against a local stub")
+    print("=" * 50)
+    for mode, r in results.items():
+        if mode in ("breaker_probe", "single_flight"):
+            continue
+        print(f"{mode:<12} ok={r['ok']:<4} failed={r['failed']:<4} circuit_open={r['circuit_open']:<4} "
+              f"p50={r['p50_s']:.3f}s p99={r['p99_s']:.3f}s connections={r['connections']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Resilience check for the search transport")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="callers - above 8 the extra ones queue for a connection")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run_transport_benchmark(args.requests, args.concurrency, args.seed)
+    results["single_flight"] = run_single_flight_check()
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if not check_results(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()